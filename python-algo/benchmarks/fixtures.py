@@ -0,0 +1,94 @@
+"""
+Reproducible boards for the benchmarks, built from the game config in game-configs.json at the root of the starter kit.
+
+Each fixture is a turn string with a fixed random seed, so every run and every version of gamelib times the same boards.
+"""
+import json
+import os
+import random
+
+from gamelib.game_map import CELL_LOCATIONS, HALF_ARENA, EDGE_LOCATIONS
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "game-configs.json")
+
+# name: (number of firewalls, number of information units)
+FIXTURES = {
+    "empty": (0, 0),
+    "mid_game": (90, 30),
+    "late_game": (200, 50),
+}
+
+# The first turn of a game, before either player has built anything
+TURN_0 = {
+    "p2Units": [[], [], [], [], [], [], []],
+    "turnInfo": [0, 0, -1],
+    "p1Stats": [30.0, 25.0, 5.0, 0],
+    "p1Units": [[], [], [], [], [], [], []],
+    "p2Stats": [30.0, 25.0, 5.0, 0],
+    "events": {"selfDestruct": [], "breach": [], "damage": [], "shield": [], "move": [], "spawn": [], "death": [], "attack": [], "melee": []},
+}
+
+
+def load_config(path=CONFIG_PATH):
+    """Reads the game config the fixtures are built for
+
+    Args:
+        * path: The config file, game-configs.json by default
+
+    Returns:
+        The config as a dict
+
+    """
+    with open(path) as config_file:
+        return json.load(config_file)
+
+
+def build_turn_string(config, firewalls, information_units, seed=0):
+    """Makes a turn string with firewalls spread over both halves of the board and information units
+    stacked on the edges, as they stand when they have just been deployed
+
+    Args:
+        * config: The config the units are taken from
+        * firewalls: The number of firewalls, each on its own tile
+        * information_units: The number of information units, split between both players
+        * seed: The seed of the random placement
+
+    Returns:
+        The turn as a json string
+
+    """
+    state = json.loads(json.dumps(TURN_0))
+    rng = random.Random(seed)
+    units = [[[] for _ in range(7)], [[] for _ in range(7)]]
+    locations = list(CELL_LOCATIONS)
+    rng.shuffle(locations)
+    unit_id = 0
+    for x, y in locations[:firewalls]:
+        type_index = rng.randrange(3)
+        stability = config["unitInformation"][type_index]["stability"]
+        units[0 if y < HALF_ARENA else 1][type_index].append([x, y, float(rng.randint(1, int(stability))), str(unit_id)])
+        unit_id += 1
+    blocked = set(locations[:firewalls])
+    edges = [[location for location in EDGE_LOCATIONS[edge] if location not in blocked] for edge in range(4)]
+    for i in range(information_units):
+        player_index = i % 2
+        #Player 0 deploys on the bottom edges and player 1 on the top edges
+        edge = edges[rng.choice([2, 3]) if player_index == 0 else rng.choice([0, 1])]
+        x, y = rng.choice(edge)
+        type_index = 3 + rng.randrange(3)
+        units[player_index][type_index].append([x, y, config["unitInformation"][type_index]["stability"], str(unit_id)])
+        unit_id += 1
+    state["p1Units"] = units[0]
+    state["p2Units"] = units[1]
+    state["turnInfo"] = [0, 40 if firewalls else 0, -1]
+    return json.dumps(state)
+
+
+def load_fixtures(config):
+    """Builds every fixture
+
+    Returns:
+        A dict from fixture name to turn string
+
+    """
+    return {name: build_turn_string(config, firewalls, information_units) for name, (firewalls, information_units) in FIXTURES.items()}
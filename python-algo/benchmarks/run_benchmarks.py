@@ -0,0 +1,188 @@
+"""
+Times the gamelib hot paths on the boards in fixtures.py and reports the results as JSON, so runs of different
+versions of gamelib can be compared.
+
+Run from anywhere, or as a module from the python-algo folder:
+    python3 benchmarks/run_benchmarks.py [--repeats 20] [--output results.json] [--compare previous.json] [--only parse]
+    python3 -m benchmarks.run_benchmarks
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+if __name__ == "__main__" and not __package__:
+    # Run as a script, so make the python-algo folder importable for gamelib and benchmarks
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.fixtures import load_config, load_fixtures
+from gamelib.game_state import GameState, shared_field_cache
+from gamelib.game_map import GameMap, CELL_LOCATIONS, EDGE_LOCATIONS, HALF_ARENA
+from gamelib.unit import GameUnit
+
+
+def json_loads(config, turn_string, game_state):
+    return lambda: json.loads(turn_string)
+
+
+def per_unit_parse(config, turn_string, game_state):
+    """Builds the map the way the starter kit originally did, constructing each GameUnit from the config
+    """
+    def run():
+        state = json.loads(turn_string)
+        game_map = GameMap(config)
+        for player_index, units in enumerate([state["p1Units"], state["p2Units"]]):
+            for type_index, unit_list in enumerate(units[:6]):
+                unit_type = config["unitInformation"][type_index]["shorthand"]
+                for x, y, stability, _ in unit_list:
+                    game_map[int(x), int(y)] += (GameUnit(unit_type, config, player_index, stability, int(x), int(y)),)
+    return run
+
+
+def parse(config, turn_string, game_state):
+    return lambda: GameState(config, turn_string)
+
+
+def path_from_edges(config, turn_string, game_state, cold):
+    starts = [list(location) for location in EDGE_LOCATIONS[2] + EDGE_LOCATIONS[3] if not game_state.contains_stationary_unit(location)]
+    def run():
+        if cold:
+            shared_field_cache.clear()
+        for start in starts:
+            game_state.find_path_to_edge(start)
+    return run
+
+
+def path_from_edges_cold(config, turn_string, game_state):
+    return path_from_edges(config, turn_string, game_state, True)
+
+
+def path_from_edges_warm(config, turn_string, game_state):
+    return path_from_edges(config, turn_string, game_state, False)
+
+
+def range_queries(config, turn_string, game_state):
+    game_map = game_state.game_map
+    locations = [list(location) for location in CELL_LOCATIONS]
+    def run():
+        for location in locations:
+            game_map.get_locations_in_range(location, 3)
+    return run
+
+
+def attackers(config, turn_string, game_state):
+    locations = [list(location) for location in CELL_LOCATIONS]
+    def run():
+        for location in locations:
+            game_state.get_attackers(location, 0)
+    return run
+
+
+def _attacking_units(game_state):
+    return [unit for location in CELL_LOCATIONS for unit in game_state.game_map[location]
+            if not unit.stationary or unit.unit_type == game_state.config["unitInformation"][2]["shorthand"]]
+
+
+def targeting(config, turn_string, game_state):
+    units = _attacking_units(game_state)
+    def run():
+        for unit in units:
+            game_state.get_target(unit)
+    return run
+
+
+def targeting_batch(config, turn_string, game_state):
+    units = _attacking_units(game_state)
+    return lambda: game_state.get_targets(units)
+
+
+def spawn_validation(config, turn_string, game_state):
+    firewall = config["unitInformation"][0]["shorthand"]
+    ping = config["unitInformation"][3]["shorthand"]
+    our_half = [list(location) for location in CELL_LOCATIONS if location[1] < HALF_ARENA]
+    edges = [list(location) for location in EDGE_LOCATIONS[2] + EDGE_LOCATIONS[3]]
+    def run():
+        for location in our_half:
+            game_state.can_spawn(firewall, location)
+        for location in edges:
+            game_state.can_spawn(ping, location)
+    return run
+
+
+BENCHMARKS = [json_loads, per_unit_parse, parse, path_from_edges_cold, path_from_edges_warm, range_queries, attackers, targeting, targeting_batch, spawn_validation]
+
+
+def time_benchmark(run, repeats):
+    """Calls run once to warm up and then repeats times
+
+    Returns:
+        A dict with the mean and fastest time of a call in milliseconds
+
+    """
+    run()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"mean_ms": round(sum(times) / len(times), 4), "min_ms": round(min(times), 4)}
+
+
+def run_benchmarks(repeats, only=None):
+    config = load_config()
+    results = {}
+    for fixture, turn_string in load_fixtures(config).items():
+        results[fixture] = {}
+        for benchmark in BENCHMARKS:
+            if only and benchmark.__name__ not in only:
+                continue
+            game_state = GameState(config, turn_string)
+            game_state.suppress_warnings(True)
+            results[fixture][benchmark.__name__] = time_benchmark(benchmark(config, turn_string, game_state), repeats)
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "results": results,
+    }
+
+
+def print_comparison(report, previous):
+    """Prints the fastest time of every benchmark next to the same benchmark in a previous report
+    """
+    print("{:<12} {:<22} {:>10} {:>10} {:>8}".format("fixture", "benchmark", "before ms", "after ms", "ratio"))
+    for fixture, benchmarks in report["results"].items():
+        for name, timing in benchmarks.items():
+            before = previous["results"].get(fixture, {}).get(name)
+            if before is None:
+                print("{:<12} {:<22} {:>10} {:>10.3f}".format(fixture, name, "-", timing["min_ms"]))
+                continue
+            ratio = timing["min_ms"] / before["min_ms"] if before["min_ms"] else float("inf")
+            print("{:<12} {:<22} {:>10.3f} {:>10.3f} {:>7.2f}x".format(fixture, name, before["min_ms"], timing["min_ms"], ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times the gamelib hot paths")
+    parser.add_argument("--repeats", type=int, default=20, help="How many times each benchmark is timed")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of printing it")
+    parser.add_argument("--compare", help="A JSON report from an earlier run to compare against")
+    parser.add_argument("--only", nargs="+", help="Only run the benchmarks with these names")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.repeats, args.only)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as previous:
+            print_comparison(report, json.load(previous))
+    elif not args.output:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
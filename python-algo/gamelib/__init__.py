@@ -7,6 +7,9 @@ from .util import debug_write
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
+from .frame_stats import FrameStats
+from .timeline import ActionTimeline
+from .simulator import Simulator
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "frame_stats", "game_state", "game_map", "navigation", "profiling", "simulator", "timeline", "unit", "util"]
  
\ No newline at end of file
@@ -1,15 +1,42 @@
 import json
+import queue
+import threading
+import time
+import traceback
 
-from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .game_state import GameState, load_config
+from .frame_stats import FrameStats
+from .profiling import profiler, profiling_requested
+from .util import get_command, debug_write, BANNER_TEXT, send_command, StateString, get_state_type, decode_state_fields
 
 class AlgoCore(object):
     """This class handles communication with the game itself. Your strategy should subclass it.
 
     Attributes:
         * config (JSON): json object containing information about the game
+        * frame_fields (list): The action frame fields set with request_frame_fields, or None to decode whole frames
+        * batch_frames (bool): Whether action frames are collected and passed to on_action_frames before the next turn
+        * background_frames (bool): Whether stdin is read and action frames are handled on background threads
+        * wait_for_frames (bool): With background_frames, whether each turn waits for the worker to finish the last action phase
+        * frame_stats (:obj: FrameStats): With background_frames, the totals of the last action phase's events. Replaced when the worker
+          finishes the action phase, so it is complete when on_turn runs unless wait_for_frames was turned off
+        * turn_time_fraction (float): The share of the game's soft time limit per turn that turn_time_budget allows
+        * turn_deadline (float): The time.monotonic() value the current turn should be submitted by, set just before on_turn is called
+        * profile_hot_paths (bool): Whether the hot GameState methods are timed and summarized after each turn. Also turned on by the GAMELIB_PROFILE environment variable
 
     """
+    frame_fields = None
+    batch_frames = False
+    background_frames = False
+    wait_for_frames = True
+    frame_queue_size = 256
+    frame_stats = None
+    turn_time_fraction = 0.8
+    turn_deadline = None
+    profile_hot_paths = False
+    _turn_overhead = 0.0
+    _last_turn_seconds = None
+
     def __init__(self):
         self.config = None
 
@@ -19,11 +46,14 @@ class AlgoCore(object):
         on the config, a json file which contains information about the game.
         """
         self.config = config
+        load_config(config)
 
     def on_turn(self, game_state):
         """
         This step function is called every turn and is passed a string containing
-        the current game state, which can be used to initialize a new GameMap
+        the current game state, which can be used to initialize a new GameMap.
+        The string is a StateString, so its decoded json is available as game_state.state
+        and is shared with any GameState built from it rather than decoded again.
         """
         self.submit_default_turn()
     
@@ -32,10 +62,214 @@ class AlgoCore(object):
         This function is called every action frame and is passed a string containing
         the current game state, which can also be used to initialize a new GameMap.
         Be careful about going over your compute time as this is potentially called hundreds of 
-        times per turn
+        times per turn. Like on_turn, the string is a StateString and is only decoded if its state is used.
         """
         pass
 
+    def on_action_frames(self, frames):
+        """
+        If batch_frames is set, this is called with every action frame of the last action phase
+        when the next turn arrives, instead of calling on_action_frame as each frame arrives.
+        By default it passes each frame to on_action_frame.
+        """
+        for frame in frames:
+            self.on_action_frame(frame)
+
+    def request_frame_fields(self, *fields, batch=False):
+        """Declares which fields of the action frames this strategy reads, so the rest of each frame is never decoded.
+        Call this from __init__ or on_game_start. The state of each frame passed to on_action_frame then only holds these fields,
+        so a GameState can only be built from a frame if all of its fields were requested.
+        Frames are not decoded at all unless on_action_frame or on_action_frames is overridden, or until their state is used.
+
+        Args:
+            * fields: Field paths such as "p2Units" or "events.breach". With no fields whole frames are decoded when their state is used
+            * batch: If True, frames are collected and passed to on_action_frames just before the next turn
+
+        """
+        self.frame_fields = list(fields) if fields else None
+        self.batch_frames = batch
+
+    def request_background_frames(self, queue_size=256, wait_for_frames=True):
+        """Reads stdin on a background thread and hands action frames to a worker thread,
+        which adds up their events in frame_stats and then calls on_action_frame or collects the frame for on_action_frames.
+        on_action_frame and on_action_frames run on the worker thread. Each turn waits for the worker to finish the last action phase,
+        so frame_stats is complete and the frame hooks are done when on_turn runs. The frames are handled while the game is
+        still sending them, so that wait is usually short. The worker also finishes the last action phase before the game ends.
+
+        Args:
+            * queue_size: The most lines read ahead of the main thread, and the most frames waiting for the worker
+            * wait_for_frames: If False, on_turn is called as soon as the turn arrives, while the worker finishes the last action phase.
+              frame_stats may then still hold the phase before, and the frame hooks may run at the same time as on_turn,
+              so any state they share with on_turn needs a lock
+
+        """
+        self.background_frames = True
+        self.frame_queue_size = queue_size
+        self.wait_for_frames = wait_for_frames
+
+    def request_profiling(self):
+        """Times the hot GameState methods, such as parsing, pathing, targeting and spawning, and writes a summary
+        of their call counts and times with debug_write after each turn. See profiling.HotPathProfiler.
+        Setting the GAMELIB_PROFILE environment variable does the same without changing any code.
+        """
+        self.profile_hot_paths = True
+
+    def _handles_action_frames(self):
+        """Whether on_action_frame or on_action_frames is overridden. Frames are skipped entirely when neither is.
+        """
+        return type(self).on_action_frame is not AlgoCore.on_action_frame or \
+            type(self).on_action_frames is not AlgoCore.on_action_frames
+
+    def _handle_action_frame(self, frame, frame_batch):
+        frame.fields = self.frame_fields
+        if self.batch_frames:
+            frame_batch.append(frame)
+        else:
+            self.on_action_frame(frame)
+
+    def _read_commands(self, command_queue):
+        """Puts each line from stdin into command_queue until the end game message, or None if the game closes stdin first
+        """
+        try:
+            while True:
+                command = get_command()
+                command_queue.put(command)
+                if get_state_type(command) == 2:
+                    return
+        except SystemExit:
+            command_queue.put(None)
+
+    def _consume_frames(self, frame_queue, frame_batch):
+        """Adds each queued action frame to the current FrameStats and passes it on to the strategy.
+        A threading.Event in the queue marks the end of an action phase: the stats and batch are handed over and the event is set
+        """
+        while True:
+            frame = frame_queue.get()
+            if isinstance(frame, threading.Event):
+                self._finish_action_phase(frame_batch)
+                frame.set()
+                continue
+            try:
+                handles_frames = self._handles_action_frames()
+                if handles_frames and self.frame_fields is None:
+                    # The strategy decodes the whole frame anyway, so share it
+                    state = frame.state
+                else:
+                    # Any events fields the strategy requested reuse this decode
+                    state = decode_state_fields(frame, ["events"])
+                self._frame_collector.add_frame(state)
+                if handles_frames:
+                    self._handle_action_frame(frame, frame_batch)
+            except Exception:
+                debug_write("Error handling action frame:\n{}".format(traceback.format_exc()))
+
+    def _finish_action_phase(self, frame_batch):
+        """Publishes the stats of the action phase that just ended and passes its batched frames to on_action_frames
+        """
+        self.frame_stats = self._frame_collector
+        self._frame_collector = FrameStats()
+        if frame_batch:
+            frames = list(frame_batch)
+            frame_batch.clear()
+            try:
+                self.on_action_frames(frames)
+            except Exception:
+                debug_write("Error handling action frames:\n{}".format(traceback.format_exc()))
+
+    def _start_frame_threads(self, frame_batch):
+        """Starts the stdin reader and frame worker threads
+
+        Returns:
+            A function that returns the next line from stdin, and the queue the worker reads frames from
+
+        """
+        command_queue = queue.Queue(self.frame_queue_size)
+        frame_queue = queue.Queue(self.frame_queue_size)
+        self._frame_collector = FrameStats()
+        threading.Thread(target=self._read_commands, args=(command_queue,), daemon=True).start()
+        threading.Thread(target=self._consume_frames, args=(frame_queue, frame_batch), daemon=True).start()
+
+        def read_command():
+            command = command_queue.get()
+            if command is None:
+                # Let the worker finish the frames it was given before stopping
+                self._wait_for_worker(frame_queue)
+                exit()
+            return command
+        return read_command, frame_queue
+
+    def _wait_for_worker(self, frame_queue):
+        """Marks the end of an action phase in frame_queue and waits until the worker has handed it over
+        """
+        phase_done = threading.Event()
+        frame_queue.put(phase_done)
+        phase_done.wait()
+
+    def turn_time_budget(self):
+        """The number of seconds a turn should take, so that the game never penalizes us for going over its soft time limit.
+        This is turn_time_fraction of the config's waitTimeBotSoft, less the time the game counted for our last turn
+        beyond what we measured ourselves, such as the time spent passing messages.
+
+        Returns:
+            The budget in seconds
+
+        """
+        timing = self.config.get("timingAndReplay", {}) if self.config else {}
+        soft_limit = timing.get("waitTimeBotSoft", 5000) / 1000
+        return max(0.0, soft_limit * self.turn_time_fraction - self._turn_overhead)
+
+    def time_left(self):
+        """The number of seconds until turn_deadline, or the whole turn_time_budget if no turn has started
+
+        Returns:
+            The time left in seconds, never less than 0
+
+        """
+        if self.turn_deadline is None:
+            return self.turn_time_budget()
+        return max(0.0, self.turn_deadline - time.monotonic())
+
+    def run_anytime(self, candidates, evaluate, check_every=1, deadline=None):
+        """Evaluates candidates in the order given until they run out or the deadline passes, and returns the best one found.
+        Put the most promising candidates first, so that a turn under load still plays a good move instead of timing out.
+        The first candidate is always evaluated, even if the deadline has already passed.
+
+        Args:
+            * candidates: An iterable of candidates in priority order, such as lists of spawns to try
+            * evaluate: A function taking a candidate and returning its score, higher is better, or None to skip it
+            * check_every: How many candidates to evaluate between checks of the clock, for evaluations too quick to time each one
+            * deadline: The time.monotonic() value to stop at. Defaults to turn_deadline, or the turn_time_budget from now
+
+        Returns:
+            A tuple (best candidate, its score), or (None, None) if no candidate got a score
+
+        """
+        if deadline is None:
+            deadline = self.turn_deadline if self.turn_deadline is not None else time.monotonic() + self.turn_time_budget()
+        best = None
+        best_score = None
+        clock = time.monotonic
+        for count, candidate in enumerate(candidates, 1):
+            score = evaluate(candidate)
+            if score is not None and (best_score is None or score > best_score):
+                best = candidate
+                best_score = score
+            if count % check_every == 0 and clock() >= deadline:
+                break
+        return best, best_score
+
+    def _start_turn_clock(self, game_state_string):
+        """Sets turn_deadline for the turn that just arrived. The game reports how long it counted for our last turn,
+        and anything beyond what we measured is kept as overhead to take off future budgets.
+        """
+        now = time.monotonic()
+        if self._last_turn_seconds is not None:
+            stats = decode_state_fields(game_state_string, ["p1Stats"]).get("p1Stats")
+            if stats and len(stats) > 3 and stats[3]:
+                self._turn_overhead = max(0.0, float(stats[3]) / 1000 - self._last_turn_seconds)
+        self.turn_deadline = now + self.turn_time_budget()
+        return now
+
     def submit_default_turn(self):
         send_command("")
         send_command("")
@@ -47,44 +281,82 @@ class AlgoCore(object):
         it receives the "End" turn message from the game.
         """
         debug_write(BANNER_TEXT)
+        profiling = self.profile_hot_paths or profiling_requested()
+        if profiling:
+            profiler.enable()
+            profiler.reset()
+        frame_batch = []
+        if self.background_frames:
+            read_command, frame_queue = self._start_frame_threads(frame_batch)
+        else:
+            read_command, frame_queue = get_command, None
 
-        while True:
-            # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
-            # manually kill this Python program.
-            game_state_string = get_command()
-            if "replaySave" in game_state_string:
-                """
-                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
-                """
-                parsed_config = json.loads(game_state_string)
-                self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
-                if stateType == 0:
-                    """
-                    This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
-                    deploy phase. Printing is handled by the provided functions.
-                    """
-                    self.on_turn(game_state_string)
-                elif stateType == 1:
-                    """
-                    If stateType == 1, this game_state_string string represents a single frame of an action phase
-                    """
-                    self.on_action_frame(game_state_string)
-                elif stateType == 2:
+        try:
+            while True:
+                # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
+                # manually kill this Python program.
+                game_state_string = read_command()
+                if "replaySave" in game_state_string:
                     """
-                    This is the end game message. This means the game is over so break and finish the program.
+                    This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                     """
-                    debug_write("Got end state quitting bot.")
-                    break
+                    parsed_config = json.loads(game_state_string)
+                    # Build the unit prototypes now rather than on the first turn, even if on_game_start is overridden
+                    load_config(parsed_config)
+                    self.on_game_start(parsed_config)
+                elif "turnInfo" in game_state_string:
+                    game_state_string = StateString(game_state_string)
+                    stateType = get_state_type(game_state_string)
+                    if stateType is None:
+                        stateType = int(game_state_string.state.get("turnInfo")[0])
+                    if stateType != 1 and frame_queue is not None:
+                        # The worker hands over the last action phase when it reaches this marker. The game only ends once it has
+                        if self.wait_for_frames or stateType == 2:
+                            self._wait_for_worker(frame_queue)
+                        else:
+                            frame_queue.put(threading.Event())
+                    elif stateType != 1 and frame_batch:
+                        self.on_action_frames(list(frame_batch))
+                        frame_batch.clear()
+                    if stateType == 0:
+                        """
+                        This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
+                        deploy phase. Printing is handled by the provided functions.
+                        """
+                        turn_start = self._start_turn_clock(game_state_string)
+                        self.on_turn(game_state_string)
+                        self._last_turn_seconds = time.monotonic() - turn_start
+                        if profiling:
+                            turn_info = decode_state_fields(game_state_string, ["turnInfo"]).get("turnInfo")
+                            turn_number = turn_info[1] if turn_info else "?"
+                            profiler.report("Turn {} took {:.3f} ms".format(turn_number, self._last_turn_seconds * 1000))
+                    elif stateType == 1:
+                        """
+                        If stateType == 1, this game_state_string string represents a single frame of an action phase
+                        """
+                        if frame_queue is not None:
+                            frame_queue.put(game_state_string)
+                        elif self._handles_action_frames():
+                            self._handle_action_frame(game_state_string, frame_batch)
+                    elif stateType == 2:
+                        """
+                        This is the end game message. This means the game is over so break and finish the program.
+                        """
+                        debug_write("Got end state quitting bot.")
+                        break
+                    else:
+                        """
+                        Something is wrong? Received an incorrect or improperly formatted string.
+                        """
+                        debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
                 else:
                     """
                     Something is wrong? Received an incorrect or improperly formatted string.
                     """
-                    debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
-            else:
-                """
-                Something is wrong? Received an incorrect or improperly formatted string.
-                """
-                debug_write("Got unexpected string : {}".format(game_state_string))
+                    debug_write("Got unexpected string : {}".format(game_state_string))
+        finally:
+            # Also stop when the loop ends early, on an error or when stdin closes
+            if profiling:
+                if any(profiler.calls.values()):
+                    profiler.report("Calls after the last turn")
+                profiler.disable()
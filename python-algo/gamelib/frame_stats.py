@@ -0,0 +1,55 @@
+class FrameStats:
+    """Running totals of the events in the action frames of one action phase.
+    Player indices are 0 for you and 1 for your opponent, like everywhere else in gamelib.
+
+    Attributes:
+        * frames (int): The number of frames that have been added
+        * breaches (list): For each player index, a dict from the location [x, y] as a tuple to the number of that player's units that scored there
+        * breach_damage (list): For each player index, the total damage that player's breaches dealt to the other player
+        * damage_taken (list): For each player index, the total damage dealt to that player's units
+        * spawns (list): For each player index, a dict from unit type index to the number of units of that type the player spawned
+        * deaths (list): For each player index, the number of that player's units that were destroyed, not counting ones the player removed
+
+    """
+    def __init__(self):
+        self.frames = 0
+        self.breaches = [{}, {}]
+        self.breach_damage = [0, 0]
+        self.damage_taken = [0, 0]
+        self.spawns = [{}, {}]
+        self.deaths = [0, 0]
+
+    def add_frame(self, state):
+        """Adds the events of a single action frame
+
+        Args:
+            * state: The decoded json of an action frame. Only its events are read
+
+        """
+        self.frames += 1
+        events = state.get("events", {})
+        for location, damage, _, _, player in events.get("breach", []):
+            breaches = self.breaches[player - 1]
+            location = tuple(location)
+            breaches[location] = breaches.get(location, 0) + 1
+            self.breach_damage[player - 1] += damage
+        for _, damage, _, _, player in events.get("damage", []):
+            self.damage_taken[player - 1] += damage
+        for _, unit_type, _, player in events.get("spawn", []):
+            spawns = self.spawns[player - 1]
+            spawns[unit_type] = spawns.get(unit_type, 0) + 1
+        for _, _, _, player, removed_by_owner in events.get("death", []):
+            if not removed_by_owner:
+                self.deaths[player - 1] += 1
+
+    def total_breaches(self, player_index=0):
+        """The number of units the given player scored with
+
+        Args:
+            * player_index: The player whose breaches to count, 0 for you 1 for the enemy
+
+        Returns:
+            The number of breaches
+
+        """
+        return sum(self.breaches[player_index].values())
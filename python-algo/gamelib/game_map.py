@@ -1,13 +1,92 @@
 import math
+import random
+from array import array
 from .unit import GameUnit
 from .util import debug_write
 
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+
+def _build_arena_tables():
+    """Computes the diamond shaped arena once per process
+
+    Returns:
+        A tuple (mask, cell_ids, cell_locations). mask and cell_ids are indexed by x * ARENA_SIZE + y,
+        mask holds 1 for tiles on the board and 0 otherwise, and cell_ids holds the dense id of each tile
+        or -1 for tiles off the board. cell_locations maps each dense id back to its (x, y) tuple, in the
+        same order that iterating over a GameMap visits them.
+
+    """
+    mask = bytearray(ARENA_SIZE * ARENA_SIZE)
+    cell_ids = [-1] * (ARENA_SIZE * ARENA_SIZE)
+    cell_locations = []
+    for y in range(ARENA_SIZE):
+        row_size = y + 1 if y < HALF_ARENA else ARENA_SIZE - y
+        for x in range(HALF_ARENA - row_size, HALF_ARENA + row_size):
+            mask[x * ARENA_SIZE + y] = 1
+            cell_ids[x * ARENA_SIZE + y] = len(cell_locations)
+            cell_locations.append((x, y))
+    return bytes(mask), tuple(cell_ids), tuple(cell_locations)
+
+ARENA_MASK, CELL_IDS, CELL_LOCATIONS = _build_arena_tables()
+
+def _build_edge_tables():
+    """Computes the four edges of the arena once per process
+
+    Returns:
+        A tuple (edge_locations, edge_cells). edge_locations holds, for each edge, a tuple of (x, y) tuples
+        in the order returned by GameMap.get_edges. edge_cells holds, for each edge, a frozenset of the
+        flat indices x * ARENA_SIZE + y of its tiles for constant time membership tests.
+
+    """
+    top_right = tuple((HALF_ARENA + num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA))
+    top_left = tuple((HALF_ARENA - 1 - num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA))
+    bottom_left = tuple((HALF_ARENA - 1 - num, num) for num in range(HALF_ARENA))
+    bottom_right = tuple((HALF_ARENA + num, num) for num in range(HALF_ARENA))
+    edge_locations = (top_right, top_left, bottom_left, bottom_right)
+    edge_cells = tuple(frozenset(x * ARENA_SIZE + y for x, y in edge) for edge in edge_locations)
+    return edge_locations, edge_cells
+
+EDGE_LOCATIONS, EDGE_CELLS = _build_edge_tables()
+
+# One random 64 bit key per tile. A map's stationary_hash is the XOR of the keys of every tile holding a stationary unit.
+_zobrist_random = random.Random(28)
+ZOBRIST_KEYS = tuple(_zobrist_random.getrandbits(64) for _ in range(ARENA_SIZE * ARENA_SIZE))
+
+# Shared by every GameMap. Stencils are keyed by radius, range results by (flat index, radius).
+_RANGE_STENCILS = {}
+_RANGE_LOCATIONS = {}
+
+def _get_range_stencil(radius):
+    """Gets the (dx, dy) offsets of every tile within range of a tile, computing them the first time a radius is seen
+
+    A unit with a given range affects all locations whose centers are within that range + 0.51. The offsets are
+    ordered by dx and then dy, which is the order get_locations_in_range has always returned locations in.
+
+    """
+    stencil = _RANGE_STENCILS.get(radius)
+    if stencil is None:
+        reach = int(radius + 0.51)
+        stencil = tuple((dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)
+                        if math.sqrt(dx * dx + dy * dy) < radius + 0.51)
+        _RANGE_STENCILS[radius] = stencil
+    return stencil
+
+def _stencil_locations(x, y, stencil):
+    locations = []
+    for dx, dy in stencil:
+        i = x + dx
+        j = y + dy
+        if 0 <= i < ARENA_SIZE and 0 <= j < ARENA_SIZE and ARENA_MASK[i * ARENA_SIZE + j]:
+            locations.append((i, j))
+    return tuple(locations)
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
 
-    game_map[x, y] will return a list of Units located at that location, 
-    or an empty list if there are no units at the location
+    game_map[x, y] will return a tuple of Units located at that location, 
+    or an empty tuple if there are no units at the location
 
     Attributes:
         * config (JSON): Contains information about the game
@@ -17,6 +96,22 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * stationary_owner (bytearray): For each cell, 0 if it holds no stationary unit, otherwise the owning player_index + 1
+        * stationary_type (bytearray): For each cell, 0 if it holds no stationary unit, otherwise the unit's index in config["unitInformation"] + 1
+        * stationary_stability (array): For each cell, the stability of its stationary unit, or 0 if there is none
+        * stationary_version (int): Incremented whenever the stationary grids are updated, useful for invalidating caches
+        * stationary_hash (int): A Zobrist hash of which tiles hold stationary units. Maps with the same walls have the same hash
+        * stationary_units (list): For each cell, its stationary GameUnit, or None if there is none
+        * mobile_units (tuple): For each player index, a dict from cell to the list of that player's information units there.
+          Only cells holding some of the player's information units have an entry
+
+    The module level ARENA_MASK, CELL_IDS, CELL_LOCATIONS, EDGE_LOCATIONS and EDGE_CELLS tables describe the board layout. They are built
+    once per process and shared by every GameMap, GameState and ShortestPathFinder.
+
+    The stationary_* grids are flat and indexed by x * ARENA_SIZE + y, and so are the cells of mobile_units. They mirror
+    the units at each location and are kept up to date by add_unit, remove_unit and assignment through game_map[x, y].
+    The units at a location are read only, so to change them assign a new sequence, for example
+    game_map[x, y] = game_map[x, y] + (unit,).
 
     """
     def __init__(self, config):
@@ -28,14 +123,29 @@ class GameMap:
         """
         self.config = config
         self.enable_warnings = True
-        self.ARENA_SIZE = 28
-        self.HALF_ARENA = int(self.ARENA_SIZE / 2)
+        self.ARENA_SIZE = ARENA_SIZE
+        self.HALF_ARENA = HALF_ARENA
         self.TOP_RIGHT = 0
         self.TOP_LEFT = 1
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        #The cells whose mobile_units lists this map may change in place, or None for every cell. See copy
+        self.__owned_cells = None
+        self.__next_cell = 0
+        self.__type_index = {}
+        for index, unit_info in enumerate(config["unitInformation"]):
+            self.__type_index[unit_info["shorthand"]] = index
+        self.stationary_owner = bytearray(self.ARENA_SIZE * self.ARENA_SIZE)
+        self.stationary_type = bytearray(self.ARENA_SIZE * self.ARENA_SIZE)
+        self.stationary_stability = array('d', [0.0]) * (self.ARENA_SIZE * self.ARENA_SIZE)
+        self.stationary_version = 0
+        self.stationary_hash = 0
+        self.stationary_units = [None] * (self.ARENA_SIZE * self.ARENA_SIZE)
+        self.mobile_units = ({}, {})
+        for unit_info in config["unitInformation"]:
+            if "range" in unit_info:
+                _get_range_stencil(unit_info["range"])
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -45,34 +155,112 @@ class GameMap:
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            self.__map[location[0]][location[1]] = tuple(val)
+            self.__update_stationary(location[0], location[1])
+            self.__update_mobile(location[0], location[1])
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
+        self.__next_cell = 0
         return self
     
     def __next__(self):
-        location = self.__start
-        if location == [15,27]:
+        if self.__next_cell == len(CELL_LOCATIONS):
             raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        x, y = CELL_LOCATIONS[self.__next_cell]
+        self.__next_cell += 1
+        return [x, y]
 
     def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+        return [[() for _ in range(self.ARENA_SIZE)] for _ in range(self.ARENA_SIZE)]
+
+    def __update_stationary(self, x, y):
+        """Refreshes the stationary grids for a single cell from its units
+        """
+        index = x * self.ARENA_SIZE + y
+        self.stationary_version += 1
+        was_occupied = self.stationary_owner[index] != 0
+        self.stationary_owner[index] = 0
+        self.stationary_type[index] = 0
+        self.stationary_stability[index] = 0.0
+        self.stationary_units[index] = None
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                self.stationary_units[index] = unit
+                self.stationary_owner[index] = unit.player_index + 1
+                self.stationary_type[index] = self.__type_index[unit.unit_type] + 1
+                self.stationary_stability[index] = unit.stability
+                break
+        if was_occupied != (self.stationary_owner[index] != 0):
+            self.stationary_hash ^= ZOBRIST_KEYS[index]
+
+    def __own_cell(self, index, player_index):
+        """Copies player_index's mobile_units list for a cell if it may be shared with another map
+        """
+        if index in self.__owned_cells:
+            return
+        units = self.mobile_units[player_index].get(index)
+        if units is not None:
+            self.mobile_units[player_index][index] = list(units)
+        self.__owned_cells.add(index)
+
+    def copy(self):
+        """Makes a copy of the map that can be changed without changing this one.
+
+        Copying is cheap because the units of each cell are read only and shared between the two maps, and a map only copies
+        a cell's mobile_units list the first time it needs to change it in place. The GameUnits themselves are always shared, so
+        they should be treated as read only.
+
+        Returns:
+            A new GameMap with the same units
+
+        """
+        other = GameMap.__new__(GameMap)
+        other.__dict__.update(self.__dict__)
+        other.__map = [column[:] for column in self.__map]
+        other.stationary_owner = bytearray(self.stationary_owner)
+        other.stationary_type = bytearray(self.stationary_type)
+        other.stationary_stability = array('d', self.stationary_stability)
+        other.stationary_units = self.stationary_units[:]
+        other.mobile_units = (dict(self.mobile_units[0]), dict(self.mobile_units[1]))
+        self.__owned_cells = set()
+        other.__owned_cells = set()
+        return other
+
+    def __update_mobile(self, x, y):
+        """Refreshes both players' mobile_units entries for a single cell from its units
+        """
+        index = x * self.ARENA_SIZE + y
+        for player_units in self.mobile_units:
+            player_units.pop(index, None)
+        for unit in self.__map[x][y]:
+            if not unit.stationary:
+                self.mobile_units[unit.player_index].setdefault(index, []).append(unit)
+
+    def _place_unit(self, unit):
+        """Appends an already constructed GameUnit to the list at its location. Used when parsing the game state.
+        """
+        x, y = unit.x, unit.y
+        index = x * ARENA_SIZE + y
+        if self.__owned_cells is not None:
+            self.__own_cell(index, unit.player_index)
+        self.__map[x][y] += (unit,)
+        if not unit.stationary:
+            units = self.mobile_units[unit.player_index].get(index)
+            if units is None:
+                self.mobile_units[unit.player_index][index] = [unit]
+            else:
+                units.append(unit)
+        else:
+            # Only the first stationary unit at a location is recorded, so the grids only change if the tile was empty
+            if self.stationary_owner[index] == 0:
+                self.stationary_units[index] = unit
+                self.stationary_version += 1
+                self.stationary_owner[index] = unit.player_index + 1
+                self.stationary_type[index] = self.__type_index[unit.unit_type] + 1
+                self.stationary_stability[index] = unit.stability
+                self.stationary_hash ^= ZOBRIST_KEYS[index]
 
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
@@ -88,19 +276,9 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE:
+            return ARENA_MASK[int(x) * ARENA_SIZE + int(y)] == 1
+        return False
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -120,8 +298,7 @@ class GameMap:
             self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
             return
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [list(location) for location in EDGE_LOCATIONS[quadrant_description]]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -130,27 +307,7 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[list(location) for location in edge] for edge in EDGE_LOCATIONS]
     
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -171,9 +328,14 @@ class GameMap:
         x, y = location
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            if self.__owned_cells is not None:
+                self.__own_cell(x * self.ARENA_SIZE + y, player_index)
+            self.__map[x][y] += (new_unit,)
+            self.mobile_units[player_index].setdefault(x * self.ARENA_SIZE + y, []).append(new_unit)
         else:
-            self.__map[x][y] = [new_unit]
+            self.__map[x][y] = (new_unit,)
+            self.__update_stationary(x, y)
+            self.__update_mobile(x, y)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -188,7 +350,10 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
-        self.__map[x][y] = []
+        self.__map[x][y] = ()
+        self.__update_stationary(x, y)
+        for player_units in self.mobile_units:
+            player_units.pop(x * self.ARENA_SIZE + y, None)
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -206,15 +371,73 @@ class GameMap:
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
 
+        return [list(location) for location in self.get_range_locations(location, radius)]
+
+    def get_range_locations(self, location, radius):
+        """Gets locations in a circular area around a location from the shared range tables
+
+        Unlike get_locations_in_range this does not validate its arguments or allocate a new list. Results for
+        on-board locations are cached for the life of the process, so the returned tuple is shared and must not
+        be modified.
+
+        Args:
+            * location: The center of our search area
+            * radius: The radius of our search area
+
+        Returns:
+            A tuple of (x, y) tuples that are within our search area
+
+        """
+        x, y = location
+        x, y = int(x), int(y)
+        if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and ARENA_MASK[x * ARENA_SIZE + y]:
+            key = (x * ARENA_SIZE + y, radius)
+            locations = _RANGE_LOCATIONS.get(key)
+            if locations is None:
+                locations = _stencil_locations(x, y, _get_range_stencil(radius))
+                _RANGE_LOCATIONS[key] = locations
+            return locations
+        return _stencil_locations(x, y, _get_range_stencil(radius))
+
+    def get_stationary_unit(self, location):
+        """Gets the stationary unit at a location without searching the location's unit list
+
+        Args:
+            * location: A location on the board
+
+        Returns:
+            The stationary GameUnit at the location, or None if there is none
+
+        """
+        x, y = location
+        return self.stationary_units[int(x) * ARENA_SIZE + int(y)]
+
+    def get_mobile_units_in_range(self, location, radius, player_index):
+        """Gets one player's information units within a circular area around a location.
+        Only the cells holding that player's information units are visited when they are fewer than the cells in range.
+
+        Args:
+            * location: The center of our search area
+            * radius: The radius of our search area
+            * player_index: The player whose units to find, 0 for you 1 for the enemy
+
+        Returns:
+            A list holding a list of units for each cell in range that has some, ordered by x and then y like
+            get_range_locations
+
+        """
+        player_units = self.mobile_units[player_index]
         x, y = location
-        locations = []
-        for i in range(int(x - radius), int(x + radius + 1)):
-            for j in range(int(y - radius), int(y + radius + 1)):
-                new_location = [i, j]
-                # A unit with a given range affects all locations who's centers are within that range + 0.51 so we add 0.51 here
-                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + 0.51:
-                    locations.append(new_location)
-        return locations
+        if len(player_units) < len(_get_range_stencil(radius)):
+            reach = radius + 0.51
+            return [player_units[index] for index in sorted(player_units)
+                    if math.sqrt((index // ARENA_SIZE - x) ** 2 + (index % ARENA_SIZE - y) ** 2) < reach]
+        units_in_range = []
+        for i, j in self.get_range_locations(location, radius):
+            units = player_units.get(i * ARENA_SIZE + j)
+            if units is not None:
+                units_in_range.append(units)
+        return units_in_range
 
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
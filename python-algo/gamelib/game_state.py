@@ -1,10 +1,90 @@
+import sys
 import math
 import json
+from array import array
+from collections import deque
 
-from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
-from .unit import GameUnit
-from .game_map import GameMap
+from .navigation import ShortestPathFinder, DistanceFieldCache
+from .util import send_command, debug_write, StateString
+from .unit import GameUnit, unit_prototypes
+from .game_map import GameMap, ARENA_SIZE, HALF_ARENA, CELL_LOCATIONS, EDGE_CELLS, EDGE_LOCATIONS
+
+# Shared by every GameState so that distance fields cached for one turn can be reused on the next.
+# Each GameState has its own path finder, so searches from different threads do not share any state but this cache
+shared_field_cache = DistanceFieldCache(32)
+
+# The flat indices of the tiles we can deploy information units on, the bottom left and bottom right edges
+FRIENDLY_EDGE_CELLS = EDGE_CELLS[2] | EDGE_CELLS[3]
+
+# Reason codes of rejected spawns and removals. A spawn can fail for several reasons at once, so they are bit flags
+NOT_ENOUGH_RESOURCES = 1
+LOCATION_BLOCKED = 2
+ENEMY_TERRITORY = 4
+NOT_ON_EDGE = 8
+LOCATION_INVALID = 16
+NOTHING_TO_REMOVE = 32
+
+_SPAWN_FAILURE_REASONS = (
+    (NOT_ENOUGH_RESOURCES, " Not enough resources."),
+    (LOCATION_BLOCKED, " Location is blocked."),
+    (ENEMY_TERRITORY, " Location in enemy territory."),
+    (NOT_ON_EDGE, " Information units must be deployed on the edge."),
+    (LOCATION_INVALID, " Location invalid."),
+)
+
+# The number of rejections a GameState keeps before dropping the oldest
+REJECTION_BUFFER_SIZE = 256
+
+def format_rejection(rejection):
+    """Turns a rejection recorded by a GameState into the warning it stands for
+
+    Args:
+        * rejection: A (reason code, unit type, location) tuple from GameState.rejections
+
+    Returns:
+        The warning as a string
+
+    """
+    code, unit_type, location = rejection
+    if code == NOTHING_TO_REMOVE:
+        return "Could not remove a unit from {}. Location has no firewall or is enemy territory.".format(location)
+    fail_reason = "".join(reason for flag, reason in _SPAWN_FAILURE_REASONS if code & flag)
+    return "Could not spawn {} at location {}.{}".format(unit_type, location, fail_reason)
+
+_loaded_config = None
+
+def load_config(config):
+    """Sets the module level unit type constants and builds the unit prototypes for a config.
+    Does nothing if this config was already loaded, so it is cheap to call every turn.
+
+    Args:
+        * config (JSON): A json object containing information about the game
+
+    """
+    global _loaded_config
+    if config is _loaded_config:
+        return
+    global FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER, REMOVE, FIREWALL_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
+    UNIT_TYPE_TO_INDEX = {}
+    FILTER = config["unitInformation"][0]["shorthand"]
+    UNIT_TYPE_TO_INDEX[FILTER] = 0
+    ENCRYPTOR = config["unitInformation"][1]["shorthand"]
+    UNIT_TYPE_TO_INDEX[ENCRYPTOR] = 1
+    DESTRUCTOR = config["unitInformation"][2]["shorthand"]
+    UNIT_TYPE_TO_INDEX[DESTRUCTOR] = 2
+    PING = config["unitInformation"][3]["shorthand"]
+    UNIT_TYPE_TO_INDEX[PING] = 3
+    EMP = config["unitInformation"][4]["shorthand"]
+    UNIT_TYPE_TO_INDEX[EMP] = 4
+    SCRAMBLER = config["unitInformation"][5]["shorthand"]
+    UNIT_TYPE_TO_INDEX[SCRAMBLER] = 5
+    REMOVE = config["unitInformation"][6]["shorthand"]
+    UNIT_TYPE_TO_INDEX[REMOVE] = 6
+
+    ALL_UNITS = [PING, EMP, SCRAMBLER, FILTER, ENCRYPTOR, DESTRUCTOR]
+    FIREWALL_TYPES = [FILTER, ENCRYPTOR, DESTRUCTOR]
+    unit_prototypes(config)
+    _loaded_config = config
 
 def is_stationary(unit_type):
     return unit_type in FIREWALL_TYPES
@@ -28,12 +108,15 @@ class GameState:
         * BITS (int): A constant representing the bits resource
         * CORES (int): A constant representing the cores resource
          
-        * game_map (:obj: GameMap): The current GameMap. To retrieve a list of GameUnits at a location, use game_map[x, y]
+        * game_map (:obj: GameMap): The current GameMap. To retrieve a tuple of GameUnits at a location, use game_map[x, y]
         * turn_number (int): The current turn number. Starts at 0.
         * my_health (int): Your current remaining health
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * rejections (deque): The spawns and removals rejected this turn as (reason code, unit type, location) tuples,
+            the newest REJECTION_BUFFER_SIZE of them. They are only recorded while warnings are enabled, and are written
+            out as warnings by flush_rejections
 
     """
 
@@ -42,42 +125,29 @@ class GameState:
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn, or the already decoded dict
 
         """
         self.serialized_string = serialized_string
         self.config = config
         self.enable_warnings = True
 
-        global FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER, REMOVE, FIREWALL_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
-        UNIT_TYPE_TO_INDEX = {}
-        FILTER = config["unitInformation"][0]["shorthand"]
-        UNIT_TYPE_TO_INDEX[FILTER] = 0
-        ENCRYPTOR = config["unitInformation"][1]["shorthand"]
-        UNIT_TYPE_TO_INDEX[ENCRYPTOR] = 1
-        DESTRUCTOR = config["unitInformation"][2]["shorthand"]
-        UNIT_TYPE_TO_INDEX[DESTRUCTOR] = 2
-        PING = config["unitInformation"][3]["shorthand"]
-        UNIT_TYPE_TO_INDEX[PING] = 3
-        EMP = config["unitInformation"][4]["shorthand"]
-        UNIT_TYPE_TO_INDEX[EMP] = 4
-        SCRAMBLER = config["unitInformation"][5]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SCRAMBLER] = 5
-        REMOVE = config["unitInformation"][6]["shorthand"]
-        UNIT_TYPE_TO_INDEX[REMOVE] = 6
-
-        ALL_UNITS = [PING, EMP, SCRAMBLER, FILTER, ENCRYPTOR, DESTRUCTOR]
-        FIREWALL_TYPES = [FILTER, ENCRYPTOR, DESTRUCTOR]
-
-        self.ARENA_SIZE = 28
-        self.HALF_ARENA = int(self.ARENA_SIZE / 2)
+        load_config(config)
+
+        self.ARENA_SIZE = ARENA_SIZE
+        self.HALF_ARENA = HALF_ARENA
         self.BITS = 0
         self.CORES = 1
 
         self.game_map = GameMap(self.config)
-        self._shortest_path_finder = ShortestPathFinder()
+        self._shortest_path_finder = ShortestPathFinder(flat_arrays=True, field_cache=shared_field_cache)
         self._build_stack = []
         self._deploy_stack = []
+        self._threat_maps = {}
+        # Only states made by clone record their calls for undo, so the normal path pays nothing for it
+        self._undo_log = None
+        self.rejections = deque(maxlen=REJECTION_BUFFER_SIZE)
+        self._rejection_count = 0
         self._player_resources = [
                 {'cores': 0, 'bits': 0},  # player 0, which is you
                 {'cores': 0, 'bits': 0}]  # player 1, which is the opponent
@@ -85,10 +155,15 @@ class GameState:
 
     def __parse_state(self, state_line):
         """
-        Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        Fills in map based on the serialized game state so that self.game_map[x,y] is a tuple of GameUnits at that location.
+        state_line is the game state as a json string, a StateString, or an already decoded dict.
         """
-        state = json.loads(state_line)
+        if isinstance(state_line, dict):
+            state = state_line
+        elif isinstance(state_line, StateString):
+            state = state_line.state
+        else:
+            state = json.loads(state_line)
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -115,21 +190,21 @@ class GameState:
         """
         Helper function for __parse_state to add units to the map.
         """
-        typedef = self.config.get("unitInformation")
+        prototypes = unit_prototypes(self.config)
+        place_unit = self.game_map._place_unit
+        from_prototype = GameUnit._from_prototype
         for i, unit_types in enumerate(units):
+            prototype = prototypes[i]
             for uinfo in unit_types:
-                unit_type = typedef[i].get("shorthand")
-                sx, sy, shp = uinfo[:3]
-                x, y = map(int, [sx, sy])
-                hp = float(shp)
+                x = int(uinfo[0])
+                y = int(uinfo[1])
                 # This depends on RM always being the last type to be processed
-                if unit_type == REMOVE:
+                if prototype is None:
                     # Quick fix will deploy engine fix soon
                     if self.contains_stationary_unit([x,y]):
                         self.game_map[x,y][0].pending_removal = True
                 else:
-                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    place_unit(from_prototype(prototype, self.config, player_number, float(uinfo[2]), x, y))
 
     def __resource_required(self, unit_type):
         return self.CORES if is_stationary(unit_type) else self.BITS
@@ -161,6 +236,9 @@ class GameState:
         deploy_string = json.dumps(self._deploy_stack)
         send_command(build_string)
         send_command(deploy_string)
+        if self._undo_log:
+            self._undo_log.clear()
+        self.flush_rejections()
 
     def get_resource(self, resource_type, player_index = 0):
         """Gets a players resources
@@ -257,7 +335,8 @@ class GameState:
 
         To units, we need to be able to afford them, and the location must be
         in bounds, unblocked, on our side of the map, not on top of a unit we can't stack with, 
-        and on an edge if the unit is information.
+        and on an edge if the unit is information. When warnings are enabled, the reasons a spawn fails are
+        recorded in rejections and written out by submit_turn.
 
         Args:
             * unit_type: The type of the unit
@@ -272,33 +351,64 @@ class GameState:
             self._invalid_unit(unit_type)
             return
         
+        stationary = is_stationary(unit_type)
+        failure = self.__spawn_failure(location, stationary, self.number_affordable(unit_type) >= num)
+        if failure and self.enable_warnings:
+            self.__reject(failure, unit_type, location)
+
+        return not failure and (not stationary or num == 1)
+
+    def __spawn_failure(self, location, stationary, affordable):
+        """Checks the rules of can_spawn for a single unit. Affordability is worked out by the caller and passed in
+
+        Returns:
+            0 if the unit can be spawned, otherwise the reason codes of every rule it breaks combined
+
+        """
         if not self.game_map.in_arena_bounds(location):
-            if self.enable_warnings:
-                self.warn("Could not spawn {} at location {}. Location invalid.".format(unit_type, location))
-            return False
+            return LOCATION_INVALID
+        x, y = map(int, location)
+        cell = x * self.ARENA_SIZE + y
+        failure = 0
+        if not affordable:
+            failure |= NOT_ENOUGH_RESOURCES
+        if self.game_map.stationary_units[cell] is not None or (stationary and len(self.game_map[x, y]) > 0):
+            failure |= LOCATION_BLOCKED
+        if location[1] >= self.HALF_ARENA:
+            failure |= ENEMY_TERRITORY
+        if not stationary and cell not in FRIENDLY_EDGE_CELLS:
+            failure |= NOT_ON_EDGE
+        return failure
+
+    def __reject(self, code, unit_type, location):
+        # Copy the location so later changes to the caller's list don't rewrite the log, but keep it as given for the warning
+        self.rejections.append((code, unit_type, location[:] if type(location) == list else location))
+        self._rejection_count += 1
+
+    def format_rejections(self):
+        """Formats the rejections recorded so far this turn, oldest first
 
-        affordable = self.number_affordable(unit_type) >= num
-        stationary = is_stationary(unit_type)
-        blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
-        correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
-
-        if self.enable_warnings:
-            fail_reason = ""
-            if not affordable:
-                fail_reason = fail_reason + " Not enough resources."
-            if blocked:
-                fail_reason = fail_reason + " Location is blocked."
-            if not correct_territory:
-                fail_reason = fail_reason + " Location in enemy territory."
-            if not (stationary or on_edge):
-                fail_reason = fail_reason + " Information units must be deployed on the edge."
-            if len(fail_reason) > 0:
-                self.warn("Could not spawn {} at location {}.{}".format(unit_type, location, fail_reason))
-
-        return (affordable and correct_territory and not blocked and
-                (stationary or on_edge) and
-                (not stationary or num == 1))
+        Returns:
+            A list of warning strings
+
+        """
+        return [format_rejection(rejection) for rejection in self.rejections]
+
+    def flush_rejections(self):
+        """Writes the rejections recorded so far as warnings with a single debug_write and clears them.
+        Called by submit_turn, but can be called at any time to see them sooner. If warnings were suppressed after
+        the rejections were recorded, they are cleared without being written.
+
+        """
+        if not self.rejections:
+            return
+        lines = self.format_rejections()
+        dropped = self._rejection_count - len(lines)
+        if dropped > 0:
+            lines.insert(0, "{} earlier rejected spawns or removals were dropped".format(dropped))
+        self.rejections.clear()
+        self._rejection_count = 0
+        self.warn("\n".join(lines))
 
     def attempt_spawn(self, unit_type, locations, num=1):
         """Attempts to spawn new units with the type given in the given locations.
@@ -322,12 +432,17 @@ class GameState:
         if type(locations[0]) == int:
             locations = [locations]
         spawned_units = 0
+        recording = self._undo_log is not None
+        resources = dict(self._player_resources[0]) if recording else None
+        changes = []
         for location in locations:
             for i in range(num):
                 if self.can_spawn(unit_type, location, 1):
                     x, y = map(int, location)
                     cost = self.type_cost(unit_type)
                     resource_type = self.__resource_required(unit_type)
+                    if recording:
+                        changes.append((is_stationary(unit_type), x, y, list(self.game_map[x, y])))
                     self.__set_resource(resource_type, 0 - cost)
                     self.game_map.add_unit(unit_type, location, 0)
                     if is_stationary(unit_type):
@@ -335,8 +450,66 @@ class GameState:
                     else:
                         self._deploy_stack.append((unit_type, x, y))
                     spawned_units += 1
+        if changes:
+            self._undo_log.append((resources, changes))
         return spawned_units
 
+    def attempt_spawn_many(self, spawns):
+        """Attempts a list of spawns in one pass, as if attempt_spawn was called for each of them in order.
+
+        Exactly the units attempt_spawn would spawn are spawned and the same rejections are recorded for the ones that
+        are not, since both check each unit with the same rules as can_spawn. The costs are looked up once per entry and
+        the resources are kept as running totals and written back once at the end. A single undo reverts the whole call.
+
+        Args:
+            * spawns: A list of (unit_type, locations, num) tuples, which mean the same as the arguments of attempt_spawn
+
+        Returns:
+            A list with the number of units successfully spawned for each tuple in spawns
+
+        """
+        game_map = self.game_map
+        recording = self._undo_log is not None
+        resources = dict(self._player_resources[0])
+        held = dict(resources)
+        changes = []
+        spawned = []
+        for unit_type, locations, num in spawns:
+            if unit_type not in ALL_UNITS:
+                self._invalid_unit(unit_type)
+                spawned.append(0)
+                continue
+            if num < 1:
+                self.warn("Attempted to spawn fewer than one units! ({})".format(num))
+                spawned.append(0)
+                continue
+            if type(locations[0]) == int:
+                locations = [locations]
+            stationary = is_stationary(unit_type)
+            cost = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]].get('cost')
+            resource_key = 'cores' if stationary else 'bits'
+            stack = self._build_stack if stationary else self._deploy_stack
+            spawned_units = 0
+            for location in locations:
+                for i in range(num):
+                    failure = self.__spawn_failure(location, stationary, math.floor(held[resource_key] / cost) >= 1)
+                    if failure:
+                        if self.enable_warnings:
+                            self.__reject(failure, unit_type, location)
+                        continue
+                    x, y = map(int, location)
+                    if recording:
+                        changes.append((stationary, x, y, list(game_map[x, y])))
+                    held[resource_key] = held[resource_key] - cost
+                    game_map.add_unit(unit_type, location, 0)
+                    stack.append((unit_type, x, y))
+                    spawned_units += 1
+            spawned.append(spawned_units)
+        self._player_resources[0].update(held)
+        if changes:
+            self._undo_log.append((resources, changes))
+        return spawned
+
     def attempt_remove(self, locations):
         """Attempts to remove existing friendly firewalls in the given locations.
 
@@ -355,10 +528,59 @@ class GameState:
                 x, y = map(int, location)
                 self._build_stack.append((REMOVE, x, y))
                 removed_units += 1
-            else:
-                self.warn("Could not remove a unit from {}. Location has no firewall or is enemy territory.".format(location))
+            elif self.enable_warnings:
+                self.__reject(NOTHING_TO_REMOVE, REMOVE, location)
+        if removed_units and self._undo_log is not None:
+            self._undo_log.append((None, [(True, None, None, None)] * removed_units))
         return removed_units
 
+    def undo(self):
+        """Reverts the most recent attempt_spawn or attempt_remove call that spawned or removed anything.
+        Its units are taken off the map and out of the queue sent by submit_turn, and their cost is refunded.
+        Only states made by clone record their calls, back to the state they were cloned from, and submit_turn forgets them.
+
+        Returns:
+            True if a call was reverted, False if there was nothing to undo
+
+        """
+        if not self._undo_log:
+            return False
+        resources, changes = self._undo_log.pop()
+        for stationary, x, y, previous_units in reversed(changes):
+            if stationary:
+                self._build_stack.pop()
+            else:
+                self._deploy_stack.pop()
+            if previous_units is not None:
+                self.game_map[x, y] = list(previous_units)
+        if resources is not None:
+            self._player_resources[0] = dict(resources)
+        return True
+
+    def clone(self):
+        """Makes a copy of this game state for exploring moves, for example with attempt_spawn followed by undo.
+        Spawning or removing units on the copy does not change this game state. The copy records its spawns and removals
+        so that undo can revert them. A copy of a copy can also undo the calls made on the copy it was made from.
+
+        The config and unit prototypes are shared, and the map is copied with GameMap.copy, so only the grids,
+        resources and queues are actually copied. Units are shared between the copies and should be treated as read only.
+
+        Returns:
+            A new game state of the same class
+
+        """
+        other = type(self).__new__(type(self))
+        other.__dict__.update(self.__dict__)
+        other.game_map = self.game_map.copy()
+        other._shortest_path_finder = ShortestPathFinder(flat_arrays=True, field_cache=shared_field_cache)
+        other._build_stack = list(self._build_stack)
+        other._deploy_stack = list(self._deploy_stack)
+        other._threat_maps = dict(self._threat_maps)
+        other._undo_log = list(self._undo_log) if self._undo_log is not None else []
+        other.rejections = deque(self.rejections, maxlen=REJECTION_BUFFER_SIZE)
+        other._player_resources = [dict(resources) for resources in self._player_resources]
+        return other
+
     def get_target_edge(self, start_location):
         left = start_location[0] < self.HALF_ARENA
         bottom = start_location[1] < self.HALF_ARENA
@@ -392,9 +614,43 @@ class GameState:
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
-        end_points = self.game_map.get_edge_locations(target_edge)
+        if target_edge not in [self.game_map.TOP_LEFT, self.game_map.TOP_RIGHT, self.game_map.BOTTOM_LEFT, self.game_map.BOTTOM_RIGHT]:
+            self.warn("Passed invalid target_edge '{}'. See the documentation for valid inputs for find_path_to_edge.".format(target_edge))
+            return
+
+        end_points = EDGE_LOCATIONS[target_edge]
         return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
 
+    def find_paths_to_edge(self, start_locations, target_edge=None):
+        """Gets the paths units at several locations would take, sharing the search between them
+
+        Args:
+            * start_locations: A list of locations of hypothetical units
+            * target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Will auto calculate for each location if None.
+
+        Returns:
+            A list with the path for each location, in the same order as start_locations, matching what
+            find_path_to_edge would return for each of them. The entry is None for blocked locations.
+
+        """
+        starts_by_edge = {}
+        for index, start_location in enumerate(start_locations):
+            if self.contains_stationary_unit(start_location):
+                self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+                continue
+            edge = self.get_target_edge(start_location) if target_edge is None else target_edge
+            starts_by_edge.setdefault(edge, []).append(index)
+
+        paths = [None] * len(start_locations)
+        for edge, indices in starts_by_edge.items():
+            if edge not in [self.game_map.TOP_LEFT, self.game_map.TOP_RIGHT, self.game_map.BOTTOM_LEFT, self.game_map.BOTTOM_RIGHT]:
+                self.warn("Passed invalid target_edge '{}'. See the documentation for valid inputs for find_paths_to_edge.".format(edge))
+                continue
+            edge_paths = self._shortest_path_finder.navigate_all_starts([start_locations[index] for index in indices], EDGE_LOCATIONS[edge], self)
+            for index, path in zip(indices, edge_paths):
+                paths[index] = path
+        return paths
+
     def contains_stationary_unit(self, location):
         """Check if a location is blocked
 
@@ -408,11 +664,7 @@ class GameState:
         if not self.game_map.in_arena_bounds(location):
             self.warn('Checked for stationary unit outside of arena bounds')
             return False
-        x, y = map(int, location)
-        for unit in self.game_map[x,y]:
-            if unit.stationary:
-                return unit
-        return False
+        return self.game_map.get_stationary_unit(location) or False
 
     def warn(self, message):
         if(self.enable_warnings):
@@ -449,7 +701,7 @@ class GameState:
             return
 
         attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.range)
+        possible_locations = self.game_map.get_range_locations(attacker_location, attacking_unit.range)
         target = None
         target_stationary = True
         target_distance = sys.maxsize
@@ -511,6 +763,57 @@ class GameState:
                     target_x_distance = unit_x_distance
         return target
 
+    def get_targets(self, attacking_units):
+        """Returns the targets of several units, each chosen exactly as get_target would, in a single pass over the board.
+        Use this instead of calling get_target in a loop when finding the targets of every unit in a frame.
+
+        Each attacker only looks at the tiles holding enemy information units, or at the tiles in its range when those
+        are fewer, using the map's mobile_units index. It only looks for firewalls when no information unit is in range,
+        since information units are always preferred.
+
+        Args:
+            * attacking_units: A list of GameUnits
+
+        Returns:
+            A list holding, for each attacking unit in order, the GameUnit it would choose to attack or None
+
+        """
+        game_map = self.game_map
+        stationary_units = game_map.stationary_units
+        targets = []
+        for attacking_unit in attacking_units:
+            if not isinstance(attacking_unit, GameUnit):
+                self.warn("Passed a {} to get_targets as an attacking unit. Expected a GameUnit.".format(type(attacking_unit)))
+                targets.append(None)
+                continue
+            location = [attacking_unit.x, attacking_unit.y]
+            enemy = 1 - attacking_unit.player_index
+            candidates = game_map.get_mobile_units_in_range(location, attacking_unit.range, enemy)
+            if not candidates and attacking_unit.unit_type != SCRAMBLER:
+                candidates = []
+                for x, y in game_map.get_range_locations(location, attacking_unit.range):
+                    unit = stationary_units[x * ARENA_SIZE + y]
+                    if unit is not None and unit.player_index == enemy:
+                        candidates.append((unit,))
+            targets.append(self.__best_target(attacking_unit, candidates))
+        return targets
+
+    def __best_target(self, attacking_unit, candidates):
+        """Picks the unit get_target would choose out of lists of candidate units, all of the same category, in board order.
+        The first unit wins ties, like in get_target.
+        """
+        target = None
+        target_key = None
+        height_sign = 1 if attacking_unit.player_index == 0 else -1
+        for units in candidates:
+            for unit in units:
+                key = ((unit.x - attacking_unit.x) ** 2 + (unit.y - attacking_unit.y) ** 2, unit.stability,
+                       height_sign * unit.y, -abs(self.HALF_ARENA - 0.5 - unit.x))
+                if target_key is None or key < target_key:
+                    target = unit
+                    target_key = key
+        return target
+
     def get_attackers(self, location, player_index):
         """Gets the destructors threatening a given location
 
@@ -532,9 +835,112 @@ class GameState:
         """
         Get locations in the range of DESTRUCTOR units
         """
-        possible_locations= self.game_map.get_locations_in_range(location, self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]["range"])
+        possible_locations = self.game_map.get_range_locations(location, self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]["range"])
+        stationary_owner = self.game_map.stationary_owner
+        stationary_type = self.game_map.stationary_type
+        destructor_type = UNIT_TYPE_TO_INDEX[DESTRUCTOR] + 1
         for location in possible_locations:
+            index = location[0] * self.ARENA_SIZE + location[1]
+            if stationary_type[index] != destructor_type or stationary_owner[index] == player_index + 1:
+                continue
             for unit in self.game_map[location]:
                 if unit.unit_type == DESTRUCTOR and unit.player_index != player_index:
                     attackers.append(unit)
         return attackers
+
+    def get_threat_map(self, player_index):
+        """Gets the damage per frame enemy destructors would deal to a unit on every tile
+
+        Args:
+            * player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            A flat array indexed by x * ARENA_SIZE + y holding, for each tile, the total damage the destructors
+            not owned by player_index would deal each frame to a unit of player_index standing there
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+        return array('d', self._get_cached_threat_map(player_index))
+
+    def _get_cached_threat_map(self, player_index):
+        """Gets the threat map for player_index, rebuilding it only if stationary units changed since it was last built
+        """
+        version = self.game_map.stationary_version
+        cached = self._threat_maps.get(player_index)
+        if cached is None or cached[0] != version:
+            cached = (version, self._stamp_coverage(DESTRUCTOR, 1 - player_index, "damage"))
+            self._threat_maps[player_index] = cached
+        return cached[1]
+
+    def get_path_damage(self, unit_type, path, player_index=0):
+        """Estimates the damage an information unit would take from destructors while walking a path
+
+        The unit spends 1 / speed frames on every tile of the path except the last, where it either breaches or
+        self destructs, and takes the full threat map damage for each of those frames. Shields, other units drawing
+        fire and destructors destroyed along the way are ignored, so this is an upper bound for a single unit.
+
+        Args:
+            * unit_type: The type of information unit walking the path
+            * path: A list of locations as returned by find_path_to_edge, or a single start location to path from
+            * player_index: The index corresponding to the player controlling the unit, 0 for you 1 for the enemy
+
+        Returns:
+            The total damage the unit would take along the path, or None if there is no path
+
+        """
+        if unit_type not in ALL_UNITS or is_stationary(unit_type):
+            self._invalid_unit(unit_type)
+            return
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+        if not path:
+            self.warn("Passed an empty path {} to get_path_damage. Expected a path or a start location.".format(path))
+            return
+
+        if type(path[0]) == int:
+            path = self.find_path_to_edge(path)
+            if path is None:
+                return
+        frames_per_tile = 1 / self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]["speed"]
+        threat = self._get_cached_threat_map(player_index)
+        damage = 0
+        for x, y in path[:-1]:
+            damage += threat[x * self.ARENA_SIZE + y]
+        return damage * frames_per_tile
+
+    def get_shield_map(self, player_index):
+        """Gets the shielding friendly encryptors would give to a unit on every tile
+
+        Args:
+            * player_index: The index corresponding to the player whose encryptors are counted, 0 for you 1 for the enemy
+
+        Returns:
+            A flat array indexed by x * ARENA_SIZE + y holding, for each tile, the total shield the encryptors
+            owned by player_index would give to an information unit of player_index passing through it
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+        return self._stamp_coverage(ENCRYPTOR, player_index, "shieldAmount")
+
+    def _stamp_coverage(self, unit_type, owner_index, amount_key):
+        """Adds the range stencil of every stationary unit of unit_type owned by owner_index into one grid
+        """
+        type_info = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
+        amount = type_info.get(amount_key, 0)
+        radius = type_info["range"]
+        type_id = UNIT_TYPE_TO_INDEX[unit_type] + 1
+        owner_id = owner_index + 1
+        stationary_type = self.game_map.stationary_type
+        stationary_owner = self.game_map.stationary_owner
+        coverage = array('d', [0.0]) * (self.ARENA_SIZE * self.ARENA_SIZE)
+        for location in CELL_LOCATIONS:
+            index = location[0] * self.ARENA_SIZE + location[1]
+            if stationary_type[index] == type_id and stationary_owner[index] == owner_id:
+                for x, y in self.game_map.get_range_locations(location, radius):
+                    coverage[x * self.ARENA_SIZE + y] += amount
+        return coverage
@@ -1,8 +1,11 @@
 import heapq
+import collections
 import math
 import sys
 import queue
+import threading
 from .util import debug_write
+from .game_map import ARENA_MASK, ARENA_SIZE, HALF_ARENA, CELL_LOCATIONS
 
 class Node:
     """A pathfinding node
@@ -20,6 +23,64 @@ class Node:
         self.blocked = False
         self.pathlength = -1
 
+def _build_neighbor_table():
+    """For every tile on the board, the flat indices of its on-board neighbors in the order _get_neighbors lists them
+    """
+    neighbors = [()] * (ARENA_SIZE * ARENA_SIZE)
+    for x, y in CELL_LOCATIONS:
+        cell_neighbors = []
+        for i, j in [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]:
+            if 0 <= i < ARENA_SIZE and 0 <= j < ARENA_SIZE and ARENA_MASK[i * ARENA_SIZE + j]:
+                cell_neighbors.append(i * ARENA_SIZE + j)
+        neighbors[x * ARENA_SIZE + y] = tuple(cell_neighbors)
+    return tuple(neighbors)
+
+NEIGHBORS = _build_neighbor_table()
+
+class DistanceFieldCache:
+    """A least recently used cache of distance fields to the edge that many path finders can share, even across threads
+
+    Only the lookups and insertions hold the lock. Fields are built outside of it, so two threads missing on the same
+    walls at once may both build the field, and every field handed out must be treated as read only.
+
+    Attributes:
+        * size (int): How many fields are kept. 0 disables the cache
+
+    """
+    def __init__(self, size):
+        self.size = size
+        self._fields = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fields)
+
+    def get(self, key):
+        """The field stored under key, marked as the most recently used, or None if there is none
+        """
+        with self._lock:
+            field = self._fields.get(key)
+            if field is not None:
+                self._fields.move_to_end(key)
+            return field
+
+    def put(self, key, field):
+        """Stores a field, evicting the least recently used ones beyond size
+        """
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._fields[key] = field
+            self._fields.move_to_end(key)
+            while len(self._fields) > self.size:
+                self._fields.popitem(last=False)
+
+    def clear(self):
+        """Forgets every field
+        """
+        with self._lock:
+            self._fields.clear()
+
 """
 This class helps with pathfinding. We guarantee the results will
 be accurate, but top players may want to write their own pathfinding
@@ -31,15 +92,40 @@ class ShortestPathFinder:
     Attributes:
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
+        * flat_arrays (bool): Whether searches run on flat integer arrays instead of a grid of Node objects
+        * field_cache (:obj: DistanceFieldCache): The distance fields the flat backend remembers, possibly shared with other path finders
+        * cache_hits (int): The number of searches answered from the cache
+        * cache_misses (int): The number of searches that had to build a distance field
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * game_map (:obj: GameMap): The current gamemap. Not built when flat_arrays is set.
 
     """
-    def __init__(self):
+    def __init__(self, flat_arrays=False, cache_size=0, field_cache=None):
+        """Sets up the pathfinder
+
+        Args:
+            * flat_arrays: If True, use the flat array backend. It indexes tiles by x * ARENA_SIZE + y, keeps
+              pathlengths in a plain list, reads walls straight from the game map's stationary grid and walks
+              precomputed neighbor tables with a deque, avoiding a Node per tile and a lock per queue operation.
+              Paths are identical to the default backend.
+            * cache_size: The number of distance fields to the edge the flat backend remembers. Fields are keyed by the
+              game map's stationary_hash and the end points, so they are reused whenever the same walls are pathed
+              against again, within a turn or across turns.
+            * field_cache: A DistanceFieldCache to use instead of a private one of cache_size fields. The search state
+              itself always belongs to this path finder, so a path finder must only be used by one thread at a time,
+              while a cache can be shared by all of them.
+
+        """
         self.HORIZONTAL = 1
         self.VERTICAL = 2
         self.initialized = False
+        self.flat_arrays = flat_arrays
+        self.field_cache = field_cache if field_cache is not None else DistanceFieldCache(cache_size)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._visit_stamps = [0] * (ARENA_SIZE * ARENA_SIZE)
+        self._visit_stamp = 0
 
     def initialize_map(self, game_state):
         """Initializes the map
@@ -67,18 +153,243 @@ class ShortestPathFinder:
         """
         if game_state.contains_stationary_unit(start_point):
             return
+        if self.flat_arrays:
+            return self._navigate_flat([start_point], end_points, game_state)[0]
 
-        #Initialize map 
-        self.initialize_map(game_state)
-        #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        self._initialize_search(game_state, end_points)
         #Do pathfinding
         ideal_endpoints = self._idealness_search(start_point, end_points)
         self._validate(ideal_endpoints, end_points)
         return self._get_path(start_point, end_points)
 
+    def navigate_all_starts(self, start_points, end_points, game_state):
+        """Finds the paths units at several start points would take to reach the same set of endpoints
+
+        The map and walls are set up once, and each pocket of pathable space is searched and validated only the
+        first time one of the start points falls inside it. Every start point that can reach the edge shares a
+        single distance field. The paths are identical to calling navigate_multiple_endpoints for each start point.
+
+        Args:
+            * start_points: A list of starting locations
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            A list with the path for each start point, in the same order as start_points. The entry is None for
+            start points that are blocked by a stationary unit.
+
+        """
+        if self.flat_arrays:
+            return self._navigate_flat(start_points, end_points, game_state)
+
+        self._initialize_search(game_state, end_points)
+        paths = []
+        for start_point in start_points:
+            if game_state.contains_stationary_unit(start_point):
+                paths.append(None)
+                continue
+            #A validated start lies in a pocket that has already been searched, so its path can be read off directly
+            if not self.game_map[start_point[0]][start_point[1]].visited_validate:
+                ideal_endpoints = self._idealness_search(start_point, end_points)
+                self._validate(ideal_endpoints, end_points)
+            paths.append(self._get_path(start_point, end_points))
+        return paths
+
+    def _initialize_search(self, game_state, end_points):
+        """Resets the map, caches the end point lookups and fills in walls before a search
+        """
+        #Initialize map 
+        self.initialize_map(game_state)
+        self._end_cells = frozenset(x * ARENA_SIZE + y for x, y in end_points)
+        self._direction = self._get_direction_from_endpoints(end_points)
+        #Fill in walls
+        self._fill_walls()
+
+    def _navigate_flat(self, start_points, end_points, game_state):
+        """The flat array version of navigate_all_starts
+        """
+        game_map = game_state.game_map
+        return self.navigate_with_walls(start_points, end_points, game_map.stationary_owner, game_map.stationary_hash)
+
+    def navigate_with_walls(self, start_points, end_points, walls, walls_hash=None, move_directions=None):
+        """Finds the paths units would take against a given set of walls instead of the stationary units of a game state.
+        Always uses the flat array backend. Useful for pathing on a board that is being changed without a GameState, such as in a simulation.
+
+        Args:
+            * start_points: A list of starting locations
+            * end_points: The end points of the units, should be a list of edge locations
+            * walls: A sequence indexed by x * ARENA_SIZE + y that is nonzero for every blocked tile, like GameMap.stationary_owner
+            * walls_hash: A hash of which tiles are blocked, used as the cache key like GameMap.stationary_hash. If None the cache is not used
+            * move_directions: For each start point, the direction of the unit's last move, HORIZONTAL or VERTICAL, or 0 for a unit that
+              has not moved yet. A unit that is rerouted keeps turning the way it would have. If None every unit starts without a direction
+
+        Returns:
+            A list with the path for each start point, in the same order as start_points. The entry is None for blocked start points.
+
+        """
+        self.initialized = True
+        self._end_cells = frozenset(x * ARENA_SIZE + y for x, y in end_points)
+        self._direction = self._get_direction_from_endpoints(end_points)
+        self._blocked = walls
+        edge_field = self._get_edge_field(walls_hash, end_points)
+        self._pathlength = edge_field
+        paths = []
+        for index, start_point in enumerate(start_points):
+            start = start_point[0] * ARENA_SIZE + start_point[1]
+            if self._blocked[start]:
+                paths.append(None)
+                continue
+            if self._pathlength[start] == -1:
+                #The start is in a pocket that cannot reach the edge. Search it on a copy so the shared field stays intact
+                if self._pathlength is edge_field:
+                    self._pathlength = list(edge_field)
+                self._validate_flat(self._idealness_search_flat(start), end_points)
+            paths.append(self._get_path_flat(start_point, move_directions[index] if move_directions else 0))
+        return paths
+
+    def _get_edge_field(self, stationary_hash, end_points):
+        """Gets the distance field from the end points, from the cache if these walls have been pathed against before
+
+        The returned list may be shared with the cache and must not be modified.
+        """
+        key = (stationary_hash, self._end_cells)
+        edge_field = self.field_cache.get(key) if stationary_hash is not None else None
+        if edge_field is not None:
+            self.cache_hits += 1
+            return edge_field
+
+        self.cache_misses += 1
+        self._pathlength = [-1] * (ARENA_SIZE * ARENA_SIZE)
+        end_x, end_y = end_points[0]
+        self._validate_flat(end_x * ARENA_SIZE + end_y, end_points)
+        edge_field = self._pathlength
+        if stationary_hash is not None:
+            self.field_cache.put(key, edge_field)
+        return edge_field
+
+    def clear_cache(self):
+        """Forgets every cached distance field and resets the hit and miss counters
+        """
+        self.field_cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _idealness_search_flat(self, start):
+        """The flat array version of _idealness_search. Returns the flat index of the most ideal tile.
+        """
+        blocked = self._blocked
+        end_cells = self._end_cells
+        self._visit_stamp += 1
+        stamp = self._visit_stamp
+        visited = self._visit_stamps
+        if self._direction[1] == 1:
+            row_weight = 1
+            row_offset = 0
+        else:
+            row_weight = -1
+            row_offset = 27
+        column_sign = 1 if self._direction[0] == 1 else -1
+
+        most_ideal = start
+        if start in end_cells:
+            return start
+        best_idealness = 28 * (row_offset + row_weight * (start % ARENA_SIZE)) + (27 - column_sign * 27) // 2 + column_sign * (start // ARENA_SIZE)
+        visited[start] = stamp
+        current = collections.deque([start])
+        while current:
+            for neighbor in NEIGHBORS[current.popleft()]:
+                if blocked[neighbor] or visited[neighbor] == stamp:
+                    continue
+                if neighbor in end_cells:
+                    return neighbor
+                idealness = 28 * (row_offset + row_weight * (neighbor % ARENA_SIZE)) + (27 - column_sign * 27) // 2 + column_sign * (neighbor // ARENA_SIZE)
+                if idealness > best_idealness:
+                    best_idealness = idealness
+                    most_ideal = neighbor
+                visited[neighbor] = stamp
+                current.append(neighbor)
+        return most_ideal
+
+    def _validate_flat(self, ideal_tile, end_points):
+        """The flat array version of _validate
+        """
+        blocked = self._blocked
+        pathlength = self._pathlength
+        if ideal_tile in self._end_cells:
+            current = collections.deque()
+            for x, y in end_points:
+                cell = x * ARENA_SIZE + y
+                current.append(cell)
+                pathlength[cell] = 0
+        else:
+            current = collections.deque([ideal_tile])
+            pathlength[ideal_tile] = 0
+
+        while current:
+            cell = current.popleft()
+            if blocked[cell]:
+                continue
+            next_pathlength = pathlength[cell] + 1
+            for neighbor in NEIGHBORS[cell]:
+                if not blocked[neighbor] and pathlength[neighbor] == -1:
+                    pathlength[neighbor] = next_pathlength
+                    current.append(neighbor)
+
+    def _get_path_flat(self, start_point, move_direction=0):
+        """The flat array version of _get_path, including _choose_next_move and _better_direction.
+        move_direction is the direction of the move that led to start_point, or 0 if there was none
+        """
+        blocked = self._blocked
+        pathlength = self._pathlength
+        direction_x, direction_y = self._direction
+        path = [start_point]
+        x, y = start_point[0], start_point[1]
+
+        while pathlength[x * ARENA_SIZE + y] != 0:
+            best_x, best_y = x, y
+            best_pathlength = pathlength[x * ARENA_SIZE + y]
+            for neighbor in NEIGHBORS[x * ARENA_SIZE + y]:
+                if blocked[neighbor]:
+                    continue
+                neighbor_pathlength = pathlength[neighbor]
+                if neighbor_pathlength > best_pathlength:
+                    continue
+                new_x, new_y = divmod(neighbor, ARENA_SIZE)
+                if neighbor_pathlength == best_pathlength:
+                    #Same rules as _better_direction
+                    if move_direction == self.HORIZONTAL and not new_x == best_x:
+                        better = not y == new_y
+                    elif move_direction == self.VERTICAL and not new_y == best_y:
+                        better = not x == new_x
+                    elif move_direction == 0:
+                        better = not y == new_y
+                    elif new_y == best_y:
+                        better = (direction_x == 1 and new_x > best_x) or (direction_x == -1 and new_x < best_x)
+                    elif new_x == best_x:
+                        better = (direction_y == 1 and new_y > best_y) or (direction_y == -1 and new_y < best_y)
+                    else:
+                        better = True
+                    if not better:
+                        continue
+                best_x, best_y = new_x, new_y
+                best_pathlength = neighbor_pathlength
+
+            if x == best_x:
+                move_direction = self.VERTICAL
+            else:
+                move_direction = self.HORIZONTAL
+            path.append([best_x, best_y])
+            x, y = best_x, best_y
+        return path
+
+    def _fill_walls(self):
+        """Marks every node holding a stationary unit as blocked, reading the game map's stationary grid
+        """
+        stationary_owner = self.game_state.game_map.stationary_owner
+        for x, y in CELL_LOCATIONS:
+            if stationary_owner[x * ARENA_SIZE + y]:
+                self.game_map[x][y].blocked = True
+
     def _idealness_search(self, start, end_points):
         """
         Finds the most ideal tile in our 'pocket' of pathable space. 
@@ -93,7 +404,7 @@ class ShortestPathFinder:
         while not current.empty():
             search_location = current.get()
             for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+                if not self._is_pathable(neighbor):
                     continue
 
                 x, y = neighbor
@@ -109,6 +420,14 @@ class ShortestPathFinder:
 
         return most_ideal
 
+    def _is_pathable(self, location):
+        """Check that a location is on the board and not blocked, using the shared arena mask
+        """
+        x, y = location
+        if not (0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and ARENA_MASK[x * ARENA_SIZE + y]):
+            return False
+        return not self.game_map[x][y].blocked
+
     def _get_neighbors(self, location):
         """Get the locations adjacent to a location
         """
@@ -128,9 +447,9 @@ class ShortestPathFinder:
         point = end_points[0]
         x, y = point
         direction = [1, 1]
-        if x < self.game_state.HALF_ARENA:
+        if x < HALF_ARENA:
            direction[0] = -1
-        if y < self.game_state.HALF_ARENA:
+        if y < HALF_ARENA:
             direction[1] = -1
         return direction
 
@@ -141,10 +460,10 @@ class ShortestPathFinder:
         Returns:
             A location the unit will attempt to reach
         """
-        if location in end_points:
+        if location[0] * ARENA_SIZE + location[1] in self._end_cells:
             return sys.maxsize
 
-        direction = self._get_direction_from_endpoints(end_points)
+        direction = self._direction
 
         idealness = 0
         if direction[1] == 1:
@@ -165,7 +484,7 @@ class ShortestPathFinder:
         #VALDIATION
         #Add our most ideal tiles to current
         current = queue.Queue()
-        if ideal_tile in end_points:
+        if ideal_tile[0] * ARENA_SIZE + ideal_tile[1] in self._end_cells:
             for location in end_points:
                current.put(location)
                #Set current pathlength to 0
@@ -181,7 +500,7 @@ class ShortestPathFinder:
             current_location = current.get()
             current_node = self.game_map[current_location[0]][current_location[1]]
             for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+                if not self._is_pathable(neighbor):
                     continue
 
                 neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
@@ -228,7 +547,7 @@ class ShortestPathFinder:
         best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
         for neighbor in neighbors:
             #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+            if not self._is_pathable(neighbor):
                 continue
 
             new_best = False
@@ -274,7 +593,7 @@ class ShortestPathFinder:
             return True
         
         #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
+        direction = self._direction
         if new_tile[1] == prev_best[1]: #If they both moved horizontal...
             if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
                 return True 
@@ -299,9 +618,15 @@ class ShortestPathFinder:
 
         for y in range(28):
             for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+                if self.flat_arrays:
+                    blocked = self._blocked[x * ARENA_SIZE + 28 - y - 1]
+                    pathlength = self._pathlength[x * ARENA_SIZE + 28 - y - 1]
+                else:
+                    node = self.game_map[x][28 - y - 1]
+                    blocked = node.blocked
+                    pathlength = node.pathlength
+                if not blocked and not pathlength == -1:
+                    self._print_justified(pathlength)
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -314,3 +639,226 @@ class ShortestPathFinder:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
         sys.stderr.write(" ")
+
+
+class IncrementalPathFinder(ShortestPathFinder):
+    """Keeps the distance field to one edge up to date as single tiles are blocked or unblocked
+
+    Useful for asking "what if I build a firewall here" many times in a row. Instead of rebuilding the
+    map for every question, block the tile, read the paths you care about with get_path, then undo.
+    Only the part of the field whose distances actually change is repaired.
+
+    The field holds, for every tile connected to an end point, the same pathlength a from-scratch
+    search would give it. Tiles in pockets cut off from the edge keep a pathlength of -1, and paths
+    starting in them fall back to a full search of their pocket.
+
+    Attributes:
+        * end_points: The end points the field was built for
+
+    """
+    def __init__(self):
+        super().__init__()
+        self.end_points = None
+        self._changes = []
+
+    def build_field(self, game_state, end_points):
+        """Builds the distance field from scratch using the walls of a game state
+
+        Args:
+            * game_state: The game state whose stationary units are the walls
+            * end_points: The end points of the units, should be a list of edge locations
+
+        """
+        self._initialize_search(game_state, end_points)
+        self.end_points = end_points
+        self._changes = []
+        self._validate(end_points[0], end_points)
+
+    def block(self, location):
+        """Marks a tile as blocked, as if a firewall was built there, and repairs the field
+
+        Args:
+            * location: The location of the new wall
+
+        Returns:
+            True if the tile was open and is now blocked, False if it was already blocked or is not on the board
+
+        """
+        if not self._check_location(location, "block"):
+            return False
+        x, y = map(int, location)
+        node = self.game_map[x][y]
+        if node.blocked:
+            return False
+        self._changes.append((x, y, True))
+        self._block(x, y)
+        return True
+
+    def unblock(self, location):
+        """Marks a tile as open, as if its firewall was removed, and repairs the field
+
+        Args:
+            * location: The location of the removed wall
+
+        Returns:
+            True if the tile was blocked and is now open, False if it was already open or is not on the board
+
+        """
+        if not self._check_location(location, "unblock"):
+            return False
+        x, y = map(int, location)
+        node = self.game_map[x][y]
+        if not node.blocked:
+            return False
+        self._changes.append((x, y, False))
+        self._unblock(x, y)
+        return True
+
+    def _check_location(self, location, action):
+        """Warns and returns False if the field has not been built or the location is not on the board
+        """
+        if self.end_points is None:
+            debug_write("Attempted to {} a tile before the field was built. Use 'this_object.build_field(game_state, end_points)' first".format(action))
+            return False
+        if not self.game_state.game_map.in_arena_bounds(location):
+            self.game_state.warn("Attempted to {} location {} outside of arena bounds".format(action, location))
+            return False
+        return True
+
+    def undo(self):
+        """Reverts the most recent block or unblock
+
+        Returns:
+            True if a change was reverted, False if there was nothing to undo
+
+        """
+        if not self._changes:
+            return False
+        x, y, blocked = self._changes.pop()
+        if blocked:
+            self._unblock(x, y)
+        else:
+            self._block(x, y)
+        return True
+
+    def get_path(self, start_point):
+        """Finds the path a unit would take to reach the end points with the current walls
+
+        Args:
+            * start_point: The starting location of the unit
+
+        Returns:
+            The same path navigate_multiple_endpoints would return for this set of walls, or None if the start is blocked
+
+        """
+        node = self.game_map[start_point[0]][start_point[1]]
+        if node.blocked:
+            return
+        if node.pathlength != -1:
+            return self._get_path(start_point, self.end_points)
+        return self._get_pocket_path(start_point)
+
+    def _get_pocket_path(self, start_point):
+        """Paths within a pocket that cannot reach the edge, then clears the pocket so the field stays edge-only
+        """
+        ideal_tile = self._idealness_search(start_point, self.end_points)
+        self._validate(ideal_tile, self.end_points)
+        path = self._get_path(start_point, self.end_points)
+        for column in self.game_map:
+            for node in column:
+                if node.visited_idealness:
+                    node.visited_idealness = False
+                    node.visited_validate = False
+                    node.pathlength = -1
+        return path
+
+    def _is_end_point(self, x, y):
+        return x * ARENA_SIZE + y in self._end_cells
+
+    def _block(self, x, y):
+        node = self.game_map[x][y]
+        node.blocked = True
+        old_pathlength = node.pathlength
+        #Blocked end points keep their pathlength of 0 but stop supporting their neighbors
+        if not self._is_end_point(x, y):
+            node.pathlength = -1
+            node.visited_validate = False
+        if old_pathlength == -1:
+            return
+
+        #Find every tile that has lost all of its neighbors one step closer to the edge, level by level
+        affected = set()
+        current = collections.deque()
+        for neighbor in self._get_neighbors([x, y]):
+            if self._is_pathable(neighbor) and self.game_map[neighbor[0]][neighbor[1]].pathlength == old_pathlength + 1:
+                current.append(neighbor)
+        while current:
+            location = current.popleft()
+            key = (location[0], location[1])
+            if key in affected or self._is_end_point(location[0], location[1]):
+                continue
+            pathlength = self.game_map[location[0]][location[1]].pathlength
+            supported = False
+            for neighbor in self._get_neighbors(location):
+                if not self._is_pathable(neighbor) or (neighbor[0], neighbor[1]) in affected:
+                    continue
+                if self.game_map[neighbor[0]][neighbor[1]].pathlength == pathlength - 1:
+                    supported = True
+                    break
+            if supported:
+                continue
+            affected.add(key)
+            for neighbor in self._get_neighbors(location):
+                if self._is_pathable(neighbor) and self.game_map[neighbor[0]][neighbor[1]].pathlength == pathlength + 1:
+                    current.append(neighbor)
+
+        #Recompute the affected tiles from the unaffected tiles around them
+        for ax, ay in affected:
+            self.game_map[ax][ay].pathlength = -1
+            self.game_map[ax][ay].visited_validate = False
+        frontier = []
+        for ax, ay in affected:
+            best = -1
+            for neighbor in self._get_neighbors([ax, ay]):
+                if not self._is_pathable(neighbor) or (neighbor[0], neighbor[1]) in affected:
+                    continue
+                pathlength = self.game_map[neighbor[0]][neighbor[1]].pathlength
+                if pathlength != -1 and (best == -1 or pathlength + 1 < best):
+                    best = pathlength + 1
+            if best != -1:
+                self.game_map[ax][ay].pathlength = best
+                heapq.heappush(frontier, (best, ax, ay))
+        self._relax(frontier)
+
+    def _unblock(self, x, y):
+        node = self.game_map[x][y]
+        node.blocked = False
+        if not self._is_end_point(x, y):
+            for neighbor in self._get_neighbors([x, y]):
+                if not self._is_pathable(neighbor):
+                    continue
+                pathlength = self.game_map[neighbor[0]][neighbor[1]].pathlength
+                if pathlength != -1 and (node.pathlength == -1 or pathlength + 1 < node.pathlength):
+                    node.pathlength = pathlength + 1
+        if node.pathlength == -1:
+            return
+        self._relax([(node.pathlength, x, y)])
+
+    def _relax(self, frontier):
+        """Lowers pathlengths outward from the given (pathlength, x, y) entries until no tile can improve
+        """
+        heapq.heapify(frontier)
+        while frontier:
+            pathlength, x, y = heapq.heappop(frontier)
+            node = self.game_map[x][y]
+            if node.pathlength != pathlength:
+                continue
+            node.visited_validate = True
+            for neighbor in self._get_neighbors([x, y]):
+                if not self._is_pathable(neighbor):
+                    continue
+                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
+                if neighbor_node.pathlength == -1 or pathlength + 1 < neighbor_node.pathlength:
+                    neighbor_node.pathlength = pathlength + 1
+                    neighbor_node.visited_validate = True
+                    heapq.heappush(frontier, (pathlength + 1, neighbor[0], neighbor[1]))
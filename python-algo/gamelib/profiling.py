@@ -0,0 +1,105 @@
+import os
+import time
+
+from .game_state import GameState
+from .util import debug_write
+
+# The GameState methods that are timed. __parse_state is listed by its mangled name
+PROFILED_METHODS = ("_GameState__parse_state", "find_path_to_edge", "get_target", "get_attackers",
+                    "can_spawn", "attempt_spawn", "submit_turn")
+
+# Setting this environment variable to anything but "" or "0" turns profiling on for every AlgoCore
+PROFILE_ENV_VAR = "GAMELIB_PROFILE"
+
+
+def profiling_requested():
+    """Whether the GAMELIB_PROFILE environment variable asks for profiling
+    """
+    return os.environ.get(PROFILE_ENV_VAR, "") not in ("", "0")
+
+
+class HotPathProfiler:
+    """Counts the calls to the hot GameState methods and adds up the wall time spent in them.
+
+    Nothing is timed until enable is called, which replaces each method in PROFILED_METHODS on GameState with a timed
+    wrapper, and disable puts the original methods back, so profiling costs nothing while it is off.
+    Times are cumulative, so the time of attempt_spawn includes the can_spawn calls it makes.
+
+    Attributes:
+        * enabled (bool): Whether the GameState methods are currently wrapped
+        * calls (dict): The number of calls to each method since the last reset
+        * seconds (dict): The total wall time spent in each method since the last reset
+
+    """
+    def __init__(self):
+        self.enabled = False
+        self.__originals = {}
+        self.reset()
+
+    def reset(self):
+        """Sets every count and time back to 0
+        """
+        self.calls = {name: 0 for name in PROFILED_METHODS}
+        self.seconds = {name: 0.0 for name in PROFILED_METHODS}
+
+    def enable(self):
+        """Starts timing the methods in PROFILED_METHODS. Does nothing if they are already being timed
+        """
+        if self.enabled:
+            return
+        for name in PROFILED_METHODS:
+            method = GameState.__dict__[name]
+            self.__originals[name] = method
+            setattr(GameState, name, self.__timed(name, method))
+        self.enabled = True
+
+    def disable(self):
+        """Stops timing and puts the original methods back. The counts and times are kept until reset
+        """
+        if not self.enabled:
+            return
+        for name, method in self.__originals.items():
+            setattr(GameState, name, method)
+        self.__originals = {}
+        self.enabled = False
+
+    def __timed(self, name, method):
+        """Wraps a method so each call adds to calls and seconds. Looks the dicts up on every call since reset replaces them
+        """
+        clock = time.perf_counter
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.calls[name] += 1
+                self.seconds[name] += clock() - start
+        timed.__name__ = method.__name__
+        timed.__doc__ = method.__doc__
+        return timed
+
+    def summary(self, title="Profile"):
+        """Formats the counts and times, slowest method first, leaving out methods that were never called
+
+        Args:
+            * title: The first line of the summary
+
+        Returns:
+            A string with one line per method
+
+        """
+        lines = [title]
+        for name in sorted(PROFILED_METHODS, key=lambda name: -self.seconds[name]):
+            if self.calls[name]:
+                lines.append("  {:<20} {:>7} calls {:>10.3f} ms".format(name.replace("_GameState", ""), self.calls[name], self.seconds[name] * 1000))
+        return "\n".join(lines)
+
+    def report(self, title="Profile"):
+        """Writes the summary with debug_write and then resets the counts and times
+        """
+        debug_write(self.summary(title))
+        self.reset()
+
+
+# The profiler AlgoCore uses when profiling is turned on
+profiler = HotPathProfiler()
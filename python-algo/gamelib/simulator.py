@@ -0,0 +1,502 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from .game_map import GameMap, ARENA_MASK, ARENA_SIZE, HALF_ARENA, EDGE_CELLS, EDGE_LOCATIONS, ZOBRIST_KEYS
+from .navigation import ShortestPathFinder
+from .unit import unit_prototypes, ENCRYPTOR_INDEX, DESTRUCTOR_INDEX, SCRAMBLER_INDEX
+from .util import debug_write
+
+TOP_RIGHT = 0
+TOP_LEFT = 1
+BOTTOM_LEFT = 2
+BOTTOM_RIGHT = 3
+
+#The move directions of ShortestPathFinder
+_HORIZONTAL = 1
+_VERTICAL = 2
+
+#For each player index, the flat indices of the edge tiles that player deploys information units on
+_DEPLOY_CELLS = (EDGE_CELLS[BOTTOM_LEFT] | EDGE_CELLS[BOTTOM_RIGHT], EDGE_CELLS[TOP_RIGHT] | EDGE_CELLS[TOP_LEFT])
+
+
+def _target_edge(x, y):
+    """The edge an information unit starting at a location heads for, like GameState.get_target_edge
+    """
+    if x < HALF_ARENA:
+        return TOP_RIGHT if y < HALF_ARENA else BOTTOM_RIGHT
+    return TOP_LEFT if y < HALF_ARENA else BOTTOM_LEFT
+
+
+def _damage(unit, damage):
+    """Takes damage off an information unit, wearing down its oldest shields first. Shields that are used up stop decaying
+    """
+    unit.stability -= damage
+    shields = unit.shields
+    while shields and damage > 0:
+        if shields[0] > damage:
+            shields[0] -= damage
+            break
+        damage -= shields.pop(0)
+
+
+class _MobileUnit:
+    """An information unit taking part in a simulation
+    """
+    __slots__ = ("type_index", "player_index", "x", "y", "stability", "period", "damage_f", "damage_i",
+                 "reach", "edge", "path", "path_index", "steps", "direction", "shielded_by", "shields", "finished")
+
+    def __init__(self, type_index, player_index, x, y, prototype):
+        self.type_index = type_index
+        self.player_index = player_index
+        self.x = x
+        self.y = y
+        self.stability = prototype["max_stability"]
+        self.period = int(round(1 / prototype["speed"]))
+        self.damage_f = prototype["damage_f"]
+        self.damage_i = prototype["damage_i"]
+        self.reach = (prototype["range"] + 0.51) ** 2
+        self.edge = _target_edge(x, y)
+        self.path = None
+        self.path_index = 0
+        self.steps = 0
+        #The direction of the last move, kept when the unit is rerouted
+        self.direction = 0
+        self.shielded_by = set()
+        self.shields = []
+        self.finished = False
+
+
+class _Snapshot:
+    """The parts of a game state a simulation starts from, copied so they can be shared between simulations and pickled
+    """
+    def __init__(self, owner, types, stability, walls_hash, edge_units):
+        self.owner = bytes(owner)
+        self.types = bytes(types)
+        self.stability = array('d', stability)
+        self.walls_hash = walls_hash
+        self.edge_units = edge_units
+        #Built by the first simulation that needs it
+        self.cover = None
+
+
+class SimulationResult:
+    """The outcome of a simulated action phase.
+    Player indices are 0 for you and 1 for your opponent, like everywhere else in gamelib.
+
+    Attributes:
+        * frames (int): The number of frames until the last information unit was gone, or max_frames
+        * breaches (list): For each player index, the number of that player's units that scored
+        * breach_damage (list): For each player index, the damage that player's breaches dealt to the other player's health
+        * breach_locations (list): For each player index, the location [x, y] of each of that player's breaches
+        * unit_damage (list): For each player index, the damage that player's units dealt to enemy information units, including self destructs
+        * firewall_damage (list): For each player index, the damage that player's units dealt to enemy firewalls, including self destructs
+        * destroyed_units (list): For each player index, the number of that player's information units that were destroyed
+        * destroyed_firewalls (list): For each player index, the location [x, y] of each of that player's firewalls that was destroyed
+        * self_destructs (list): For each player index, the number of that player's units that self destructed
+
+    """
+    def __init__(self):
+        self.frames = 0
+        self.breaches = [0, 0]
+        self.breach_damage = [0, 0]
+        self.breach_locations = [[], []]
+        self.unit_damage = [0, 0]
+        self.firewall_damage = [0, 0]
+        self.destroyed_units = [0, 0]
+        self.destroyed_firewalls = [[], []]
+        self.self_destructs = [0, 0]
+
+
+class Simulator:
+    """Predicts the outcome of an action phase from a game state and the information units deployed into it.
+
+    Every frame, units whose speed lets them move take the next step of the path ShortestPathFinder gives them,
+    scoring when they step off their target edge and self destructing into nearby enemies when they are stuck. Friendly encryptors in range
+    shield each unit once, and shields wear off every frame until damage uses them up. Destructors and then information units attack the target
+    get_target would choose, and units and firewalls with no stability left are removed at the end of the frame, rerouting every unit if a firewall was destroyed.
+    Firewalls, including their range and shield coverage, are kept in flat arrays indexed by x * ARENA_SIZE + y.
+
+    Known differences from the game engine: units on different tiles that share every targeting priority are attacked in board order.
+
+    Attributes:
+        * config (JSON): Contains information about the game
+        * max_frames (int): The most frames a single simulation runs for
+        * enable_warnings (bool): Whether spawns that are skipped for being invalid are reported with debug_write
+
+    """
+    def __init__(self, config, max_frames=1000):
+        """Reads the unit types from the config
+
+        Args:
+            * config (JSON): Contains information about the game
+            * max_frames: The most frames a single simulation runs for
+
+        """
+        self.config = config
+        self.max_frames = max_frames
+        self.enable_warnings = True
+        self._prototypes = unit_prototypes(config)
+        self._type_index = {}
+        for index, unit_info in enumerate(config["unitInformation"]):
+            self._type_index[unit_info["shorthand"]] = index
+        self._damage_to_player = [unit_info.get("damageToPlayer", 1) for unit_info in config["unitInformation"]]
+        mechanics = config.get("mechanics", {})
+        self._self_destruct_steps = mechanics.get("stepsRequiredSelfDestruct", 5)
+        self._self_destruct_radius = mechanics.get("selfDestructRadius", 1.5)
+        self._shield_decay = mechanics.get("shieldDecayPerFrame", 0)
+        self._destructor = self._prototypes[DESTRUCTOR_INDEX]
+        self._encryptor = self._prototypes[ENCRYPTOR_INDEX]
+        self._path_finder = ShortestPathFinder(flat_arrays=True, cache_size=64)
+        #Only used for the range tables every GameMap shares
+        self._game_map = GameMap(config)
+
+    def simulate(self, game_state, spawns=None):
+        """Simulates the action phase that would follow a game state
+
+        Args:
+            * game_state: The game state to start from. Its firewalls and the information units standing on its edges,
+              such as ones added with attempt_spawn, take part. It is not modified.
+            * spawns: Extra information units, as a list of [unit_type, location], [unit_type, location, num] or
+              [unit_type, location, num, player_index] entries. player_index defaults to 0. Spawns that can_spawn would
+              reject for their player, because they are not information units or not on one of that player's edges, are skipped
+
+        Returns:
+            A SimulationResult
+
+        """
+        return self._run(self._snapshot(game_state), spawns)
+
+    def simulate_many(self, game_state, deployments, processes=None):
+        """Simulates the action phase that would follow a game state once for each of several candidate deployments.
+
+        The firewalls, their coverage tables and the paths from the starting tiles are worked out once and shared by
+        every deployment. With processes, the deployments are split between that many worker processes, which each
+        receive the starting state once when they start rather than with every deployment.
+
+        Args:
+            * game_state: The game state every deployment starts from. It is not modified.
+            * deployments: A list of spawns lists, each in the format simulate takes
+            * processes: The number of worker processes to use, or None to simulate in this process
+
+        Returns:
+            A list of SimulationResults, in the same order as deployments
+
+        """
+        snapshot = self._snapshot(game_state)
+        if not processes or len(deployments) < 2:
+            return [self._run(snapshot, spawns) for spawns in deployments]
+        chunksize = max(1, len(deployments) // (processes * 4))
+        with ProcessPoolExecutor(max_workers=processes, initializer=_start_worker,
+                                 initargs=(self.config, self.max_frames, snapshot)) as executor:
+            return list(executor.map(_simulate_in_worker, deployments, chunksize=chunksize))
+
+    def _snapshot(self, game_state):
+        """Copies what a simulation needs from a game state into a _Snapshot, which can be shared between simulations and sent to other processes
+        """
+        game_map = game_state.game_map
+        edge_units = []
+        for edge in EDGE_LOCATIONS:
+            for x, y in edge:
+                for unit in game_map[x, y]:
+                    if not unit.stationary:
+                        edge_units.append((self._type_index[unit.unit_type], unit.player_index, x, y))
+        return _Snapshot(game_map.stationary_owner, game_map.stationary_type, game_map.stationary_stability,
+                         game_map.stationary_hash, edge_units)
+
+    def _run(self, snapshot, spawns):
+        """Simulates one action phase starting from a snapshot
+        """
+        result = SimulationResult()
+        owner = bytearray(snapshot.owner)
+        stability = array('d', snapshot.stability)
+        walls_hash = snapshot.walls_hash
+
+        units = self.__initial_units(snapshot.edge_units, spawns, owner)
+        if not units:
+            return result
+        if snapshot.cover is None:
+            snapshot.cover = self.__build_cover(snapshot.owner, snapshot.types)
+        destructor_cover, shield_cover = snapshot.cover
+
+        destructor_damage = self._destructor["damage"]
+        shield_amount = self._encryptor["damage"]
+        reroute = True
+        frame = 0
+        while units and frame < self.max_frames:
+            if reroute:
+                self.__route(units, owner, walls_hash)
+                reroute = False
+
+            #Move, scoring or self destructing at the end of the path. Units are shielded the frame they spawn too
+            damaged_firewalls = []
+            self_destructed = set()
+            moved = [] if frame else list(units)
+            for unit in units:
+                if (frame + 1) % unit.period:
+                    continue
+                if unit.path_index == len(unit.path) - 1:
+                    if unit.x * ARENA_SIZE + unit.y in EDGE_CELLS[unit.edge]:
+                        self.__breach(unit, result)
+                    else:
+                        self.__self_destruct(unit, units, owner, stability, damaged_firewalls, result)
+                        self_destructed.add(unit)
+                    unit.stability = 0
+                    unit.finished = True
+                    continue
+                unit.path_index += 1
+                x, y = unit.path[unit.path_index]
+                unit.direction = _VERTICAL if x == unit.x else _HORIZONTAL
+                unit.x, unit.y = x, y
+                unit.steps += 1
+                if frame:
+                    moved.append(unit)
+
+            #Shields wear off a little every frame, then encryptors shield each unit once, when it first comes into range
+            if self._shield_decay:
+                self.__decay_shields(units)
+            for unit in moved:
+                if unit.stability <= 0:
+                    continue
+                for encryptor in shield_cover[unit.player_index][unit.x * ARENA_SIZE + unit.y]:
+                    if owner[encryptor] and encryptor not in unit.shielded_by:
+                        unit.shielded_by.add(encryptor)
+                        unit.stability += shield_amount
+                        unit.shields.append(shield_amount)
+
+            occupied = [{}, {}]
+            for unit in units:
+                if unit.stability > 0:
+                    occupied[unit.player_index].setdefault(unit.x * ARENA_SIZE + unit.y, []).append(unit)
+
+            #Every unit standing at the start of the attacks gets to attack, even if it is destroyed before its turn,
+            #and so do units that self destructed this frame. Units that scored do not
+            attackers = [unit for unit in units if unit.stability > 0 or unit in self_destructed]
+
+            #Destructors attack first, each choosing among the enemy units in its range
+            in_range = {}
+            for player_index in (0, 1):
+                cover = destructor_cover[player_index]
+                for cell in occupied[player_index]:
+                    for destructor in cover[cell]:
+                        if owner[destructor]:
+                            in_range.setdefault(destructor, []).append(cell)
+            for destructor in sorted(in_range):
+                target = self.__choose_unit(destructor // ARENA_SIZE, destructor % ARENA_SIZE, owner[destructor] - 1, in_range[destructor], occupied, None)
+                if target is not None:
+                    _damage(target, destructor_damage)
+                    result.unit_damage[owner[destructor] - 1] += destructor_damage
+
+            #Then information units, preferring enemy information units over firewalls
+            firewall_targets = {}
+            for unit in attackers:
+                enemy = 1 - unit.player_index
+                target = self.__choose_unit(unit.x, unit.y, unit.player_index, occupied[enemy], occupied, unit.reach)
+                if target is not None:
+                    _damage(target, unit.damage_i)
+                    result.unit_damage[unit.player_index] += unit.damage_i
+                    continue
+                if unit.type_index == SCRAMBLER_INDEX:
+                    continue
+                key = (unit.x * ARENA_SIZE + unit.y, unit.reach, enemy)
+                candidates = firewall_targets.get(key)
+                if candidates is None:
+                    candidates = []
+                    for x, y in self._game_map.get_range_locations((unit.x, unit.y), self._prototypes[unit.type_index]["range"]):
+                        if owner[x * ARENA_SIZE + y] == enemy + 1:
+                            candidates.append(x * ARENA_SIZE + y)
+                    firewall_targets[key] = candidates
+                cell = self.__choose_firewall(unit.x, unit.y, unit.player_index, candidates, stability)
+                if cell is not None:
+                    stability[cell] -= unit.damage_f
+                    result.firewall_damage[unit.player_index] += unit.damage_f
+                    damaged_firewalls.append(cell)
+
+            #Remove everything that was destroyed
+            for cell in damaged_firewalls:
+                if owner[cell] and stability[cell] <= 0:
+                    result.destroyed_firewalls[owner[cell] - 1].append([cell // ARENA_SIZE, cell % ARENA_SIZE])
+                    owner[cell] = 0
+                    walls_hash ^= ZOBRIST_KEYS[cell]
+                    reroute = True
+            remaining = []
+            for unit in units:
+                if unit.stability > 0:
+                    remaining.append(unit)
+                elif not unit.finished:
+                    result.destroyed_units[unit.player_index] += 1
+            units = remaining
+            frame += 1
+        result.frames = frame
+        return result
+
+    def __initial_units(self, edge_units, spawns, owner):
+        """Creates the information units standing on the edges of the map and the extra spawns, skipping any on a firewall
+        """
+        units = list(edge_units)
+        for spawn in spawns or []:
+            unit_type, location = spawn[0], spawn[1]
+            num = spawn[2] if len(spawn) > 2 else 1
+            player_index = spawn[3] if len(spawn) > 3 else 0
+            if not self.__valid_spawn(unit_type, location, player_index):
+                self.warn("Skipped simulating {} at location {} for player {}. Information units must be deployed on the player's edges.".format(unit_type, location, player_index))
+                continue
+            x, y = int(location[0]), int(location[1])
+            for _ in range(num):
+                units.append((self._type_index[unit_type], player_index, x, y))
+        mobile_units = []
+        for type_index, player_index, x, y in units:
+            if not owner[x * ARENA_SIZE + y]:
+                mobile_units.append(_MobileUnit(type_index, player_index, x, y, self._prototypes[type_index]))
+        return mobile_units
+
+    def __valid_spawn(self, unit_type, location, player_index):
+        """Whether a player could deploy an information unit of this type at location, ignoring resources and firewalls like can_spawn's edge rules
+        """
+        type_index = self._type_index.get(unit_type)
+        if type_index is None or player_index not in (0, 1):
+            return False
+        prototype = self._prototypes[type_index]
+        if prototype is None or prototype["stationary"]:
+            return False
+        x, y = int(location[0]), int(location[1])
+        if not (0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and ARENA_MASK[x * ARENA_SIZE + y]):
+            return False
+        return x * ARENA_SIZE + y in _DEPLOY_CELLS[player_index]
+
+    def warn(self, message):
+        if(self.enable_warnings):
+            debug_write(message)
+
+    def __build_cover(self, owner, types):
+        """For each defending player and tile, lists the enemy destructors that can hit a unit there and the friendly encryptors that can shield it
+        """
+        destructor_cover = [[() for _ in range(ARENA_SIZE * ARENA_SIZE)] for _ in (0, 1)]
+        shield_cover = [[() for _ in range(ARENA_SIZE * ARENA_SIZE)] for _ in (0, 1)]
+        for cell, type_id in enumerate(types):
+            if type_id == DESTRUCTOR_INDEX + 1:
+                #A destructor threatens units of the player that does not own it
+                cover = destructor_cover[2 - owner[cell]]
+                radius = self._destructor["range"]
+            elif type_id == ENCRYPTOR_INDEX + 1:
+                cover = shield_cover[owner[cell] - 1]
+                radius = self._encryptor["range"]
+            else:
+                continue
+            for x, y in self._game_map.get_range_locations((cell // ARENA_SIZE, cell % ARENA_SIZE), radius):
+                cover[x * ARENA_SIZE + y] += (cell,)
+        return destructor_cover, shield_cover
+
+    def __route(self, units, owner, walls_hash):
+        """Gives every unit a path from where it stands, sharing the search between units on the same tile heading for the same edge
+        that last moved in the same direction
+        """
+        starts = {}
+        for unit in units:
+            if unit.stability > 0:
+                starts.setdefault(unit.edge, {}).setdefault((unit.x * ARENA_SIZE + unit.y, unit.direction), []).append(unit)
+        for edge, cells in starts.items():
+            start_list = list(cells)
+            paths = self._path_finder.navigate_with_walls([divmod(cell, ARENA_SIZE) for cell, _ in start_list], EDGE_LOCATIONS[edge], owner, walls_hash,
+                                                          [direction for _, direction in start_list])
+            for start, path in zip(start_list, paths):
+                for unit in cells[start]:
+                    unit.path = path
+                    unit.path_index = 0
+
+    def __decay_shields(self, units):
+        """Wears every shield a unit still has down by the shield decay, each shield on its own
+        """
+        decay = self._shield_decay
+        for unit in units:
+            if not unit.shields or unit.stability <= 0:
+                continue
+            remaining = []
+            for shield in unit.shields:
+                worn = min(decay, shield)
+                unit.stability -= worn
+                if shield > worn:
+                    remaining.append(shield - worn)
+            unit.shields = remaining
+
+    def __choose_unit(self, x, y, player_index, cells, occupied, reach):
+        """Chooses which enemy information unit on the given tiles an attacker at x, y would hit, using get_target's priorities.
+        If reach is given, tiles further away are skipped.
+        """
+        enemy_units = occupied[1 - player_index]
+        best = None
+        best_key = None
+        for cell in cells:
+            cell_x, cell_y = divmod(cell, ARENA_SIZE)
+            distance = (cell_x - x) ** 2 + (cell_y - y) ** 2
+            if reach is not None and distance >= reach:
+                continue
+            height = cell_y if player_index == 0 else -cell_y
+            for unit in enemy_units[cell]:
+                if unit.stability <= 0:
+                    continue
+                key = (distance, unit.stability, height, -abs(HALF_ARENA - 0.5 - cell_x), cell)
+                if best_key is None or key < best_key:
+                    best = unit
+                    best_key = key
+        return best
+
+    def __choose_firewall(self, x, y, player_index, cells, stability):
+        """Chooses which of the given enemy firewall tiles an attacker at x, y would hit, using get_target's priorities
+        """
+        best = None
+        best_key = None
+        for cell in cells:
+            if stability[cell] <= 0:
+                continue
+            cell_x, cell_y = divmod(cell, ARENA_SIZE)
+            height = cell_y if player_index == 0 else -cell_y
+            key = ((cell_x - x) ** 2 + (cell_y - y) ** 2, stability[cell], height, -abs(HALF_ARENA - 0.5 - cell_x), cell)
+            if best_key is None or key < best_key:
+                best = cell
+                best_key = key
+        return best
+
+    def __breach(self, unit, result):
+        result.breaches[unit.player_index] += 1
+        result.breach_damage[unit.player_index] += self._damage_to_player[unit.type_index]
+        result.breach_locations[unit.player_index].append([unit.x, unit.y])
+
+    def __self_destruct(self, unit, units, owner, stability, damaged_firewalls, result):
+        """Damages the enemy firewalls and information units around a stuck unit if it has walked far enough
+        """
+        result.self_destructs[unit.player_index] += 1
+        if unit.steps < self._self_destruct_steps:
+            return
+        damage = self._prototypes[unit.type_index]["max_stability"]
+        enemy_owner = 2 - unit.player_index
+        #Unlike attacks, the blast reaches only tiles within the radius itself, without the 0.51 get_range_locations adds
+        radius = self._self_destruct_radius
+        cells = set()
+        for x, y in self._game_map.get_range_locations((unit.x, unit.y), radius):
+            if (x - unit.x) ** 2 + (y - unit.y) ** 2 > radius ** 2:
+                continue
+            cell = x * ARENA_SIZE + y
+            cells.add(cell)
+            if owner[cell] == enemy_owner:
+                stability[cell] -= damage
+                result.firewall_damage[unit.player_index] += damage
+                damaged_firewalls.append(cell)
+        for other in units:
+            if other.player_index != unit.player_index and other.stability > 0 and other.x * ARENA_SIZE + other.y in cells:
+                _damage(other, damage)
+                result.unit_damage[unit.player_index] += damage
+
+
+#The simulator and starting state of a worker process started by simulate_many
+_worker_simulator = None
+_worker_snapshot = None
+
+
+def _start_worker(config, max_frames, snapshot):
+    global _worker_simulator, _worker_snapshot
+    _worker_simulator = Simulator(config, max_frames)
+    _worker_snapshot = snapshot
+
+
+def _simulate_in_worker(spawns):
+    return _worker_simulator._run(_worker_snapshot, spawns)
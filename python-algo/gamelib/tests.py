@@ -1,8 +1,24 @@
 import unittest
 import json
+import os
+import random
+import threading
 from .game_state import GameState
 from .unit import GameUnit
-from .advanced_game_state import AdvancedGameState
+from .util import StateString, get_state_type, decode_state_fields
+from .algocore import AlgoCore
+from .frame_stats import FrameStats
+from .timeline import ActionTimeline
+from .simulator import Simulator
+from .profiling import HotPathProfiler
+from . import algocore, profiling, game_state, navigation
+from .game_map import CELL_IDS, CELL_LOCATIONS, EDGE_CELLS, EDGE_LOCATIONS
+from .navigation import ShortestPathFinder, IncrementalPathFinder
+try:
+    from .advanced_game_state import AdvancedGameState
+except ImportError:
+    # advanced_game_state.py is not part of this kit, so the tests only run against it when it is added
+    AdvancedGameState = None
 
 class BasicTests(unittest.TestCase):
 
@@ -139,6 +155,8 @@ class BasicTests(unittest.TestCase):
         self.assertEqual(True, True, "It's the end of the world as we know it, and I feel fine")
 
     def test_advanced_game_state(self, adv=False):
+        if AdvancedGameState is None:
+            self.skipTest("advanced_game_state.py is not in this kit")
         advanced = self.make_turn_0_map(True)
         self.assertTrue(isinstance(advanced, GameState))
         self.assertTrue(isinstance(advanced, AdvancedGameState))
@@ -186,10 +204,491 @@ class BasicTests(unittest.TestCase):
             game.game_map.add_unit("FF", [13,13])
         self.assertEqual(1, len(game.game_map[13,13]), "Towers seem to be stacking")
         
+    def test_parse_units(self, adv=False):
+        config = self.make_turn_0_map(adv).config
+        turn = """{"p2Units":[[[3,14,60.0,"5"]],[],[[20,16,12.0,"6"]],[],[],[],[]],"turnInfo":[0,4,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[[13,0,60.0,"1"],[2,11,0,"2"]],[[5,10,30.0,"3"]],[],[[13,0,15.0,"4"]],[],[],[[2,11,0,"7"]]],"p2Stats":[30.0,25.0,5.0,0],"events":{}}"""
+        game = GameState(config, turn)
+        game.suppress_warnings(True)
+        expected = [
+            ([13, 0], GameUnit("FF", config, 0, 60.0, 13, 0)),
+            ([2, 11], GameUnit("FF", config, 0, 0, 2, 11)),
+            ([5, 10], GameUnit("EF", config, 0, 30.0, 5, 10)),
+            ([3, 14], GameUnit("FF", config, 1, 60.0, 3, 14)),
+            ([20, 16], GameUnit("DF", config, 1, 12.0, 20, 16))]
+        expected[1][1].pending_removal = True
+        for location, unit in expected:
+            self.assertEqual(vars(unit), vars(game.game_map[location][0]), "Parsed units should match units built from the config")
+        ping = game.game_map[13, 0][1]
+        self.assertEqual(vars(GameUnit("PI", config, 0, 15.0, 13, 0)), vars(ping), "Parsed information units should match too")
+        self.assertEqual(2, len(game.game_map[13, 0]), "Units sharing a location should all be parsed")
+        self.assertEqual(1, game.game_map.stationary_owner[13 * 28 + 0], "The firewall should be recorded in the stationary grid")
+        self.assertEqual(2, game.game_map.stationary_owner[20 * 28 + 16], "Enemy firewalls should be recorded in the stationary grid")
+        self.assertEqual(12.0, game.game_map.stationary_stability[20 * 28 + 16], "Firewall stability should be recorded in the stationary grid")
+
+    def test_state_string(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        turn = StateString(game.serialized_string)
+        self.assertEqual(0, get_state_type(turn), "The state type should be read without decoding")
+        self.assertEqual(1, get_state_type('{"turnInfo": [ 1, 3, 40]}'), "Whitespace should be allowed around the state type")
+        self.assertEqual(None, get_state_type('{"turnInfo":null,"p1Units":[[],[]]}'), "A malformed turnInfo should not be read")
+        self.assertEqual(None, get_state_type('{"p1Units":[]}'), "A missing turnInfo should not be read")
+        self.assertTrue(turn.state is turn.state, "A StateString should only be decoded once")
+        self.assertEqual(json.loads(turn), turn.state, "A StateString should decode to the same json")
+        for state_line in [turn, turn.state]:
+            parsed = GameState(game.config, state_line)
+            self.assertEqual(game.turn_number, parsed.turn_number, "Decoded states should parse like strings")
+            self.assertEqual(game.get_resource(game.CORES), parsed.get_resource(parsed.CORES), "Decoded states should parse like strings")
+
+    def test_algo_core_loop(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        frame = game.serialized_string.replace('"turnInfo":[0,0,-1]', '"turnInfo":[1,0,3]')
+        end = game.serialized_string.replace('"turnInfo":[0,0,-1]', '"turnInfo":[2,0,9]')
+        received = []
+
+        class TurnAlgo(AlgoCore):
+            def on_turn(self, turn_state):
+                received.append(turn_state)
+
+        class FrameAlgo(TurnAlgo):
+            def on_action_frame(self, frame_state):
+                received.append(frame_state)
+
+        get_command = algocore.get_command
+        try:
+            for algo_class, expected in [(TurnAlgo, 1), (FrameAlgo, 2)]:
+                lines = iter([json.dumps(game.config), game.serialized_string, frame, end])
+                algocore.get_command = lambda: next(lines)
+                received = []
+                algo_class().start()
+                self.assertEqual(expected, len(received), "Action frames should only be delivered if on_action_frame is overridden")
+                self.assertTrue(all(isinstance(state, StateString) for state in received), "States should be delivered as StateStrings")
+                self.assertFalse(any("_state" in vars(state) for state in received), "Unused states should never be decoded")
+        finally:
+            algocore.get_command = get_command
+
+    def test_turn_time_budget(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        algo = AlgoCore()
+        algo.config = game.config
+        self.assertAlmostEqual(56, algo.turn_time_budget(), msg="The budget should be 80% of the soft limit")
+        self.assertAlmostEqual(56, algo.time_left(), msg="Before any turn the whole budget is left")
+
+        evaluated = []
+        def evaluate(candidate):
+            evaluated.append(candidate)
+            return None if candidate == 4 else -abs(candidate - 4.5)
+        self.assertEqual((5, -0.5), algo.run_anytime(range(8), evaluate), "The best scoring candidate should win")
+        self.assertEqual(list(range(8)), evaluated, "Every candidate should be evaluated with time left")
+        evaluated = []
+        self.assertEqual((0, -4.5), algo.run_anytime(range(8), evaluate, deadline=0), "Only the first candidate fits a passed deadline")
+        evaluated = []
+        self.assertEqual((2, -2.5), algo.run_anytime(range(8), evaluate, check_every=3, deadline=0), "The clock should only be checked every few candidates")
+        self.assertEqual((None, None), algo.run_anytime([4], evaluate))
+
+        turns = []
+        class TurnAlgo(AlgoCore):
+            def on_turn(self, turn_state):
+                turns.append((self.time_left(), self._turn_overhead))
+        second_turn = game.serialized_string.replace('"turnInfo":[0,0,-1]', '"turnInfo":[0,1,-1]').replace('"p1Stats":[30.0,25.0,5.0,0]', '"p1Stats":[30.0,25.0,5.0,6000]')
+        end = game.serialized_string.replace('"turnInfo":[0,0,-1]', '"turnInfo":[2,0,9]')
+        lines = iter([json.dumps(game.config), game.serialized_string, second_turn, end])
+        get_command = algocore.get_command
+        try:
+            algocore.get_command = lambda: next(lines)
+            TurnAlgo().start()
+        finally:
+            algocore.get_command = get_command
+        self.assertEqual(2, len(turns))
+        self.assertTrue(55 < turns[0][0] <= 56, "The first turn should get the whole budget")
+        self.assertAlmostEqual(6, turns[1][1], places=1, msg="Time the game counted beyond ours should be overhead")
+        self.assertAlmostEqual(50, turns[1][0], places=1, msg="The overhead should come off the next budget")
+
+    def test_profiling(self, adv=False):
+        original = GameState.__dict__["get_target"]
+        hot_paths = HotPathProfiler()
+        hot_paths.enable()
+        try:
+            game = self.make_turn_0_map(adv)
+            game.attempt_spawn("DF", [13, 5])
+            game.attempt_spawn("PI", [13, 0], 2)
+            game.find_path_to_edge([13, 0])
+            game.get_target(game.game_map[13, 5][0])
+            game.get_attackers([13, 8], 1)
+        finally:
+            hot_paths.disable()
+        self.assertIs(original, GameState.__dict__["get_target"], "Disabling should restore the original methods")
+        self.assertEqual(2 if adv else 1, hot_paths.calls["_GameState__parse_state"], "Parsing the state should be counted")
+        self.assertEqual(2, hot_paths.calls["attempt_spawn"])
+        self.assertEqual(3, hot_paths.calls["can_spawn"], "Calls made by other profiled methods should be counted")
+        self.assertEqual(1, hot_paths.calls["get_attackers"])
+        self.assertLess(0, hot_paths.seconds["find_path_to_edge"])
+        summary = hot_paths.summary("Test")
+        self.assertEqual("Test", summary.splitlines()[0])
+        self.assertIn("__parse_state", summary)
+        self.assertNotIn("submit_turn", summary, "Methods that were never called should be left out")
+        game.get_target(game.game_map[13, 5][0])
+        self.assertEqual(1, hot_paths.calls["get_target"], "Nothing should be counted once disabled")
+
+        reports = []
+        class TurnAlgo(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.request_profiling()
+            def on_turn(self, turn_state):
+                GameState(self.config, turn_state)
+        end = game.serialized_string.replace('"turnInfo":[0,0,-1]', '"turnInfo":[2,0,9]')
+        lines = iter([json.dumps(game.config), game.serialized_string, end])
+        get_command = algocore.get_command
+        report = profiling.debug_write
+        try:
+            algocore.get_command = lambda: next(lines)
+            profiling.debug_write = reports.append
+            TurnAlgo().start()
+        finally:
+            algocore.get_command = get_command
+            profiling.debug_write = report
+        self.assertEqual(1, len(reports), "There should be one summary per turn")
+        self.assertTrue(reports[0].startswith("Turn 0 took"))
+        self.assertIn("__parse_state", reports[0])
+        self.assertFalse(profiling.profiler.enabled, "Profiling should stop at the end of the game")
+
+        def closed_stdin():
+            raise SystemExit()
+        class FailingAlgo(TurnAlgo):
+            def on_turn(self, turn_state):
+                GameState(self.config, turn_state)
+                raise ValueError("on_turn failed")
+        reports.clear()
+        try:
+            for algo, commands, error in ((TurnAlgo, [json.dumps(game.config), game.serialized_string], SystemExit),
+                                          (FailingAlgo, [json.dumps(game.config), game.serialized_string], ValueError)):
+                lines = iter(commands)
+                algocore.get_command = lambda: next(lines, None) or closed_stdin()
+                profiling.debug_write = reports.append
+                with self.assertRaises(error):
+                    algo().start()
+                self.assertFalse(profiling.profiler.enabled, "Profiling should stop when the game ends early")
+        finally:
+            algocore.get_command = get_command
+            profiling.debug_write = report
+        self.assertEqual(2, len(reports))
+        self.assertTrue(reports[0].startswith("Turn 0 took"))
+        self.assertTrue(reports[1].startswith("Calls after the last turn"), "Calls made by a turn that failed should still be reported")
+
+    def test_frame_fields(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        frame = """{"p2Units":[[[3,14,60.0,"5"]],[],[],[],[],[],[]],"turnInfo":[1,4,12],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[29.0,25.0,5.0,0],\
+"events": {"selfDestruct":[],"breach":[[[13,27],1,3,"9",1]],"damage":[],"shield":[],"move":[],"spawn":[],"death":[],"attack":[],"melee":[]}}"""
+        full = json.loads(frame)
+        self.assertEqual({"p2Units": full["p2Units"]}, decode_state_fields(frame, ["p2Units"]), "Only the requested field should be decoded")
+        self.assertEqual({"events": {"breach": full["events"]["breach"]}, "turnInfo": full["turnInfo"]}, decode_state_fields(frame, ["events.breach", "turnInfo"]), "Nested fields should be decoded")
+        self.assertEqual({"events": full["events"]}, decode_state_fields(frame, ["events.breach", "events"]), "A whole field should win over its nested fields")
+        self.assertEqual({}, decode_state_fields(frame, ["missing", "events.missing"]), "Missing fields should be left out")
+        spaced = '{"p1Stats" : [30.0, 25.0], "turnInfo"\n: [0, 4, -1]}'
+        self.assertEqual({"turnInfo": [0, 4, -1], "p1Stats": [30.0, 25.0]}, decode_state_fields(spaced, ["turnInfo", "p1Stats"]), "Whitespace around the colon should be allowed")
+        nested = '{"events": {"turnInfo": [1, 9, 9], "breach": []}, "turnInfo": [0, 4, -1]}'
+        self.assertEqual({"turnInfo": [0, 4, -1]}, decode_state_fields(nested, ["turnInfo"]), "Nested keys with the same name should be skipped")
+        self.assertEqual(0, get_state_type(nested))
+        only_nested = '{"events": {"turnInfo": [1, 9, 9]}}'
+        self.assertEqual({}, decode_state_fields(only_nested, ["turnInfo"]), "A key that is only nested is not a top level field")
+        self.assertEqual(None, get_state_type(only_nested))
+
+        received = []
+
+        class BatchAlgo(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.request_frame_fields("events.breach", batch=True)
+
+            def on_turn(self, turn_state):
+                received.append(turn_state)
+
+            def on_action_frames(self, frames):
+                received.append([frame.state for frame in frames])
+
+        get_command = algocore.get_command
+        try:
+            lines = iter([json.dumps(game.config), frame, frame, game.serialized_string, frame, frame.replace('"turnInfo":[1,4,12]', '"turnInfo":[2,4,13]')])
+            algocore.get_command = lambda: next(lines)
+            BatchAlgo().start()
+        finally:
+            algocore.get_command = get_command
+        breach_state = {"events": {"breach": full["events"]["breach"]}}
+        self.assertEqual(3, len(received), "Frames should be delivered in batches before each turn and at the end")
+        self.assertEqual([breach_state, breach_state], received[0], "Batched frames should only hold the requested fields")
+        self.assertEqual(game.serialized_string, received[1], "The turn should follow its frames")
+        self.assertEqual([breach_state], received[2], "The last batch should be delivered at the end of the game")
+
+    def test_background_frames(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        events = {"breach": [[[25, 16], 1, 5, "71", 1], [[25, 16], 2, 4, "72", 1], [[2, 11], 1, 3, "90", 2]],
+            "damage": [[[12, 9], 3, 3, "79", 2]], "spawn": [[[14, 27], 3, "80", 2], [[13, 0], 0, "81", 1]],
+            "death": [[[12, 9], 3, "86", 2, False], [[5, 10], 0, "3", 1, True]]}
+        stats = FrameStats()
+        stats.add_frame({"events": events})
+        self.assertEqual([{(25, 16): 2}, {(2, 11): 1}], stats.breaches, "Breaches should be counted per player and location")
+        self.assertEqual([3, 1], stats.breach_damage, "Breach damage should be added up per player")
+        self.assertEqual(2, stats.total_breaches(0), "Total breaches should add up every location")
+        self.assertEqual([0, 3], stats.damage_taken, "Damage should be added up per owner")
+        self.assertEqual([{0: 1}, {3: 1}], stats.spawns, "Spawns should be counted per player and type")
+        self.assertEqual([0, 1], stats.deaths, "Removed units should not count as deaths")
+
+        state = json.loads(game.serialized_string)
+        state["turnInfo"] = [1, 0, 5]
+        state["events"] = events
+        frame = json.dumps(state)
+        end = game.serialized_string.replace('"turnInfo":[0,0,-1]', '"turnInfo":[2,1,0]')
+        received = []
+
+        class BackgroundAlgo(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.request_background_frames(queue_size=2)
+                self.seen = 0
+
+            def on_action_frame(self, frame):
+                self.seen += 1
+
+            def on_turn(self, turn_state):
+                received.append((self.frame_stats.frames, self.frame_stats.total_breaches(0), self.frame_stats.total_breaches(1), self.seen))
+
+        get_command = algocore.get_command
+        try:
+            lines = iter([json.dumps(game.config), game.serialized_string] + [frame] * 5 + [game.serialized_string, end])
+            algocore.get_command = lambda: next(lines)
+            BackgroundAlgo().start()
+        finally:
+            algocore.get_command = get_command
+        self.assertEqual([(0, 0, 0, 0), (5, 10, 5, 5)], received, "Every frame of the action phase should be handled before the next turn")
+
+        received = []
+        try:
+            # The game ends right after an action phase, which the worker should still finish
+            lines = iter([json.dumps(game.config), game.serialized_string] + [frame] * 3 + [end])
+            algocore.get_command = lambda: next(lines)
+            algo = BackgroundAlgo()
+            algo.start()
+        finally:
+            algocore.get_command = get_command
+        self.assertEqual((3, 6), (algo.seen, algo.frame_stats.total_breaches(0)), "The last action phase should be handled before the game ends")
+
+        release = threading.Event()
+        handled = []
+        errors = []
+        class EagerAlgo(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.request_frame_fields("events.breach")
+                self.request_background_frames(queue_size=8, wait_for_frames=False)
+
+            def on_action_frame(self, frame):
+                # Hold the worker until the turn after this action phase has started
+                release.wait(5)
+                handled.append(frame.state)
+                raise ValueError("broken hook")
+
+            def on_turn(self, turn_state):
+                received.append(len(handled))
+                if len(received) == 2:
+                    release.set()
+        received = []
+        write = algocore.debug_write
+        try:
+            lines = iter([json.dumps(game.config), game.serialized_string] + [frame] * 5 + [game.serialized_string, end])
+            algocore.get_command = lambda: next(lines)
+            algocore.debug_write = errors.append
+            EagerAlgo().start()
+        finally:
+            algocore.get_command = get_command
+            algocore.debug_write = write
+        self.assertEqual([0, 0], received, "The turn should not wait for the frames")
+        frame_errors = [error for error in errors if error.startswith("Error handling action frame")]
+        self.assertIn("Traceback", frame_errors[0], "Errors in frame hooks should be written with their traceback")
+        self.assertIn("broken hook", frame_errors[0])
+        self.assertEqual(5, len(frame_errors), "The worker should keep going after a hook fails")
+        self.assertEqual({"events": {"breach": events["breach"]}}, handled[0])
+
+        frame_string = StateString(frame)
+        frame_string.fields = ["events.breach"]
+        self.assertIs(decode_state_fields(frame_string, ["events"])["events"]["breach"], frame_string.state["events"]["breach"],
+            "The events the worker decodes should be reused for the requested fields")
+
+        def closed_stdin():
+            raise SystemExit
+        try:
+            algocore.get_command = closed_stdin
+            self.assertRaises(SystemExit, BackgroundAlgo().start)
+        finally:
+            algocore.get_command = get_command
+
+    def test_timeline(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        first = {"turnInfo": [1, 3, 0], "p1Units": [[], [], [[13, 6, 75.0, "30"]], [], [], [], []], "p2Units": [[], [], [], [[12, 9, 11.0, "86"]], [], [], []],
+            "events": {"spawn": [[[12, 9], 3, "86", 2]], "attack": [[[13, 6], [12, 9], 4, 2, "30", "86", 1]], "damage": [[[12, 9], 4, 3, "86", 2]]}}
+        second = {"turnInfo": [1, 3, 1], "p1Units": [[], [], [[13, 6, 75.0, "30"]], [], [], [], []], "p2Units": [[], [], [], [], [], [], []],
+            "events": {"attack": [[[13, 6], [12, 8], 4, 2, "30", "86", 1], [[13, 6], [12, 8], 4, 2, "30", "86", 1], [[14, 6], [12, 8], 3, 2, "31", "86", 1]],
+                "death": [[[12, 8], 3, "86", 2, False], [[20, 20], 0, "12", 2, True]], "breach": [[[25, 16], 1, 3, "71", 1], [[2, 11], 1, 3, "72", 2]]}}
+        timeline = ActionTimeline(game.config)
+        timeline.add_frame(first)
+        timeline.add_frame(json.dumps(second))
+        self.assertEqual(10, len(timeline), "Every event should be a row")
+        self.assertEqual(2, timeline.frames, "Both frames should be counted")
+        self.assertEqual([0, 0, 0], [timeline.frame[row] for row in timeline.rows("damage") + timeline.rows("spawn") + timeline.rows("attack")[:1]], "Rows should record their frame")
+        self.assertEqual([11.0], [timeline.hp[row] for row in timeline.rows("damage")], "Damage rows should record the stability left")
+        self.assertEqual([[2, 11]], timeline.breach_locations(1), "Enemy breaches should be listed")
+        self.assertEqual([[25, 16]], timeline.breach_locations(0), "Our breaches should be listed")
+        self.assertEqual({(13, 6): 12, (14, 6): 3}, timeline.damage_dealt("DF", 0), "Damage should be added up per destructor")
+        self.assertEqual({}, timeline.damage_dealt("DF", 1), "The enemy dealt no damage")
+        self.assertEqual([([12, 8], "PI", [14, 6], "DF")], timeline.deaths(1), "Deaths should name the last attacker and skip removed units")
+        self.assertEqual(0.0, timeline.hp[timeline.rows("death")[0]], "Destroyed units should have no stability left")
+        timeline.clear()
+        self.assertEqual(0, len(timeline), "Clearing should remove every row")
+        self.assertEqual([], timeline.deaths(1), "Clearing should remove every row")
+
+    def test_simulator(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        simulator = Simulator(game.config)
+        result = simulator.simulate(game, [["PI", [13, 0], 3]])
+        self.assertEqual([3, 0], result.breaches, "Every ping should score on an empty board")
+        self.assertEqual([[27, 14]] * 3, result.breach_locations[0], "Pings should score on their target edge")
+        self.assertEqual(58, result.frames, "Pings take two frames per step")
+        self.assertEqual([1, 0], simulator.simulate(game, [["PI", [13.0, 0.0]]]).breaches, "Float locations should be simulated like attempt_spawn takes them")
+        game.game_map.add_unit("DF", [24, 15], 1)
+        result = simulator.simulate(game, [["EI", [13, 0]]])
+        self.assertEqual([0, 0], result.breaches, "The destructor should stop a single EMP")
+        self.assertEqual([1, 0], result.destroyed_units, "The EMP should be destroyed")
+        self.assertLess(0, result.firewall_damage[0], "The EMP should shoot the destructor on its way")
+        result = simulator.simulate(game, [["PI", [13, 0], 4]])
+        self.assertEqual([1, 0], result.breaches, "Only the last ping should get past the destructor")
+        simulator.enable_warnings = False
+        for spawn in [["PI", [0, 0]], ["PI", [27, 27]], ["PI", [28, 0]], ["PI", [13, 5]], ["PI", [13, 27], 1, 0], ["FF", [13, 0]]]:
+            self.assertEqual(0, simulator.simulate(game, [spawn]).frames, "{} should be skipped".format(spawn))
+        self.assertEqual([0, 1], simulator.simulate(game, [["PI", [13, 27], 1, 1]]).breaches, "The enemy deploys on the top edges")
+
+        game = self.make_turn_0_map(adv)
+        for x in range(9, 19):
+            game.game_map.add_unit("FF", [x, 4], 1)
+        stabilities = list(game.game_map.stationary_stability)
+        result = simulator.simulate(game, [["PI", [13, 0], 4]])
+        self.assertEqual([4, 0], result.self_destructs, "Trapped pings should self destruct")
+        self.assertEqual([[], [[16, 4], [17, 4], [18, 4]]], result.destroyed_firewalls, "The self destructs should break the wall")
+        self.assertEqual(stabilities, list(game.game_map.stationary_stability), "Simulating should not change the game state")
+        self.assertEqual(1, len(game.game_map[17, 4]), "Simulating should not remove units from the map")
+
+        #A ping walled into the bottom corner blows up next to an enemy EMP that is walled in beside it
+        game = self.make_turn_0_map(adv)
+        config = json.loads(json.dumps(game.config))
+        config["mechanics"]["stepsRequiredSelfDestruct"] = 0
+        for location in ([14, 0], [13, 1], [12, 2]):
+            game.game_map.add_unit("FF", location, 0)
+        game.game_map.add_unit("EI", [12, 1], 1)
+        result = Simulator(config).simulate(game, [["PI", [13, 0]]])
+        self.assertEqual([1, 0], result.self_destructs)
+        self.assertEqual([0, 1], result.destroyed_units, "The self destruct should destroy the enemy EMP")
+        self.assertEqual(1 + 15, result.unit_damage[0], "The ping's attack and its self destruct should both count")
+
+    def test_simulator_replay(self, adv=False):
+        replay_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts", "test_replay.replay")
+        if not os.path.exists(replay_path):
+            self.skipTest("scripts/test_replay.replay is not in this kit")
+        with open(replay_path) as replay:
+            lines = [line for line in replay.read().splitlines() if line.strip()]
+        config = json.loads(lines[0])
+        phases = {}
+        for line in lines[1:]:
+            frame = json.loads(line)
+            if frame["turnInfo"][0] == 1:
+                phases.setdefault(frame["turnInfo"][1], []).append(frame)
+        simulator = Simulator(config)
+        simulator.enable_warnings = False
+        for turn, frames in sorted(phases.items()):
+            #The first frame already has its shields and damage applied, so take them back off to get the state the phase starts from
+            start = json.loads(json.dumps(frames[0]))
+            change = {}
+            for damage in start["events"]["damage"]:
+                change[damage[3]] = change.get(damage[3], 0) + damage[1]
+            for shield in start["events"]["shield"]:
+                change[shield[5]] = change.get(shield[5], 0) - shield[2]
+            for units in start["p1Units"] + start["p2Units"]:
+                for unit in units:
+                    unit[2] += change.get(unit[3], 0)
+            game = (AdvancedGameState if adv else GameState)(config, json.dumps(start))
+            result = simulator.simulate(game)
+
+            breaches = [0, 0]
+            destroyed_firewalls = [[], []]
+            for frame in frames:
+                for breach in frame["events"]["breach"]:
+                    breaches[breach[4] - 1] += 1
+                for death in frame["events"]["death"]:
+                    if death[1] < 3 and not death[4]:
+                        destroyed_firewalls[death[3] - 1].append(death[0])
+            message = "The action phase of turn {} should match the replay".format(turn)
+            #The replay holds the spawn frame even when nothing was deployed
+            self.assertEqual(len(frames), max(1, result.frames), message)
+            self.assertEqual(breaches, result.breaches, message)
+            self.assertEqual([sorted(locations) for locations in destroyed_firewalls], [sorted(locations) for locations in result.destroyed_firewalls], message)
+
+    def test_simulate_many(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [24, 15], 1)
+        game.game_map.add_unit("DF", [3, 15], 1)
+        simulator = Simulator(game.config)
+        deployments = [[["PI", [13, 0], 4]], [["EI", [13, 0]]], [], [["PI", [4, 9], 2], ["SI", [20, 6]]], [["PI", [13, 27], 3, 1]]]
+        expected = [vars(simulator.simulate(game, spawns)) for spawns in deployments]
+        self.assertEqual(expected, [vars(result) for result in simulator.simulate_many(game, deployments)], "Sharing the starting state should not change any result")
+        if not adv:
+            results = simulator.simulate_many(game, deployments, processes=2)
+            self.assertEqual(expected, [vars(result) for result in results], "Worker processes should return results in order")
+
+    def test_arena_tables(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        self.assertEqual(420, len(CELL_LOCATIONS), "The arena should have 420 tiles")
+        self.assertEqual(CELL_LOCATIONS, tuple(tuple(location) for location in game.game_map), "Iteration order should match the cell ids")
+        for cell_id, (x, y) in enumerate(CELL_LOCATIONS):
+            self.assertEqual(cell_id, CELL_IDS[x * game.ARENA_SIZE + y], "Cell ids should map back to their locations")
+        self.assertTrue(game.game_map.in_arena_bounds([0, 13]), "The left corner should be in bounds")
+        self.assertFalse(game.game_map.in_arena_bounds([0, 12]), "Tiles outside the diamond should be out of bounds")
+        self.assertFalse(game.game_map.in_arena_bounds([28, 13]), "Tiles outside the grid should be out of bounds")
+
+    def test_edges(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        edges = game.game_map.get_edges()
+        self.assertEqual([13, 0], edges[game.game_map.BOTTOM_LEFT][0], "The bottom left edge should start at the bottom corner")
+        self.assertEqual([27, 13], edges[game.game_map.BOTTOM_RIGHT][13], "The bottom right edge should end at the right corner")
+        self.assertEqual([14, 27], edges[game.game_map.TOP_RIGHT][0], "The top right edge should start at the top corner")
+        self.assertEqual([0, 14], edges[game.game_map.TOP_LEFT][13], "The top left edge should end at the left corner")
+        edges[0].append([0, 0])
+        self.assertEqual(14, len(game.game_map.get_edges()[0]), "Returned edge lists should not share the cached tables")
+        for edge, locations in enumerate(game.game_map.get_edges()):
+            for x, y in locations:
+                self.assertIn(x * game.ARENA_SIZE + y, EDGE_CELLS[edge], "Edge cells should match edge locations")
+        self.assertFalse(game.can_spawn("PI", [13, 1]), "Information units should only spawn on the edge")
+        self.assertTrue(game.can_spawn("PI", [27, 13]), "The right corner is on the bottom right edge")
+
+    def test_stationary_grid(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        index = 13 * game.ARENA_SIZE + 10
+        self.assertEqual(0, game.game_map.stationary_owner[index], "An empty tile should have no stationary owner")
+        game.game_map.add_unit("EI", [13,10], 1)
+        self.assertEqual(0, game.game_map.stationary_owner[index], "Information units should not mark a tile as stationary")
+        game.game_map.add_unit("DF", [13,10], 1)
+        self.assertEqual(2, game.game_map.stationary_owner[index], "The owner of a destructor should be player 1")
+        self.assertEqual(3, game.game_map.stationary_type[index], "The grid should store the destructor type")
+        self.assertEqual(75, game.game_map.stationary_stability[index], "The grid should store the destructor stability")
+        self.assertTrue(game.contains_stationary_unit([13,10]), "The destructor should block the tile")
+        game.game_map.remove_unit([13,10])
+        self.assertEqual(0, game.game_map.stationary_type[index], "Removing units should clear the grid")
+        self.assertFalse(game.contains_stationary_unit([13,10]), "The tile should be free again")
+
     def test_get_units_in_range(self, adv=False):
         game = self.make_turn_0_map(adv)
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3)), "Wrong number of tiles in range")
+        cached = game.game_map.get_range_locations([13,13], 3)
+        self.assertIs(cached, game.game_map.get_range_locations([13,13], 3), "Range queries should be served from the cache")
+        self.assertEqual([list(location) for location in cached], game.game_map.get_locations_in_range([13,13], 3), "Cached and listed ranges should agree")
+        self.assertEqual(14, len(game.game_map.get_locations_in_range([13,0], 3)), "Range should be clipped to the arena")
 
     def _test_get_attackers(self):
         game = self.make_turn_0_map(True)
@@ -207,6 +706,407 @@ class BasicTests(unittest.TestCase):
         game.game_map.add_unit("DF", [14,14], 1)
         self.assertEqual(3, len(game.get_attackers([13,13], 0)), "We should be in danger from 3 places")
 
+    def test_threat_map(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [12,14], 1)
+        game.game_map.add_unit("DF", [13,14], 1)
+        game.game_map.add_unit("DF", [13,11], 0)
+        game.game_map.add_unit("EF", [14,5], 0)
+        threat = game.get_threat_map(0)
+        for x, y in game.game_map:
+            expected = 4.0 * len(game.get_attackers([x, y], 0))
+            self.assertEqual(expected, threat[x * game.ARENA_SIZE + y], "Threat map disagrees with get_attackers at {}".format([x, y]))
+        self.assertEqual(4.0, game.get_threat_map(1)[13 * game.ARENA_SIZE + 13], "Only our destructor should threaten the enemy")
+        shield = game.get_shield_map(0)
+        self.assertEqual(10.0, shield[14 * game.ARENA_SIZE + 7], "Tiles near our encryptor should be shielded")
+        self.assertEqual(0.0, shield[14 * game.ARENA_SIZE + 10], "Tiles out of encryptor range should not be shielded")
+        self.assertEqual(0.0, max(game.get_shield_map(1)), "The enemy has no encryptors")
+
+    def test_path_damage(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        self.assertEqual(0, game.get_path_damage("PI", [13, 0]), "Nothing should shoot at us on an empty board")
+        game.game_map.add_unit("DF", [22, 14], 1)
+        path = game.find_path_to_edge([13, 0])
+        threat = game.get_threat_map(0)
+        expected = sum(threat[x * game.ARENA_SIZE + y] for x, y in path[:-1]) * 2
+        self.assertLess(0, expected, "The destructor should cover part of the path")
+        self.assertEqual(expected, game.get_path_damage("PI", path), "Pings spend two frames on every tile")
+        self.assertEqual(expected, game.get_path_damage("PI", [13, 0]), "Passing a start location should path from it")
+        self.assertEqual(expected * 2, game.get_path_damage("EI", [13, 0]), "EMPs are half as fast as pings")
+        game.game_map.add_unit("DF", [24, 15], 1)
+        self.assertLess(expected, game.get_path_damage("PI", [13, 0]), "A new destructor should invalidate the cached threat map")
+        self.assertIsNone(game.get_path_damage("PI", []), "An empty path should be rejected")
+        self.assertIsNone(game.get_path_damage("PI", None))
+        game.game_map.add_unit("FF", [13, 0], 0)
+        self.assertIsNone(game.get_path_damage("PI", [13, 0]), "A blocked start has no path")
+
+    def test_batch_pathing(self, adv=False):
+        rng = random.Random(5)
+        for _ in range(2):
+            game = self.make_turn_0_map(adv)
+            for x in range(game.ARENA_SIZE):
+                if x != 13:
+                    game.game_map.add_unit("FF", [x, 13], 0)
+            for x, y in [[4, 9], [5, 9], [6, 9], [3, 10], [7, 10], [3, 11], [7, 11], [4, 12], [5, 12], [6, 12]]:
+                game.game_map.add_unit("FF", [x, y], 0)
+            for _ in range(60):
+                location = list(CELL_LOCATIONS[rng.randrange(len(CELL_LOCATIONS))])
+                if location[1] != 13:
+                    game.game_map.add_unit("DF", location, rng.randint(0, 1))
+            starts = [list(location) for location in CELL_LOCATIONS[::3]]
+            self.assertEqual([game.find_path_to_edge(start) for start in starts], game.find_paths_to_edge(starts), "Batch paths should match single paths")
+            self.assertEqual([game.find_path_to_edge(start, game.game_map.TOP_LEFT) for start in starts[::4]],
+                game.find_paths_to_edge(starts[::4], game.game_map.TOP_LEFT), "Batch paths should match single paths to a fixed edge")
+
+    def test_flat_pathing(self, adv=False):
+        rng = random.Random(13)
+        starts = [list(location) for location in CELL_LOCATIONS]
+        for _ in range(4):
+            game = self.make_turn_0_map(adv)
+            for _ in range(rng.randint(20, 200)):
+                game.game_map.add_unit("FF", list(CELL_LOCATIONS[rng.randrange(len(CELL_LOCATIONS))]), rng.randint(0, 1))
+            for edge in range(4):
+                node_finder = ShortestPathFinder()
+                flat_finder = ShortestPathFinder(flat_arrays=True)
+                self.assertEqual(node_finder.navigate_all_starts(starts, EDGE_LOCATIONS[edge], game),
+                    flat_finder.navigate_all_starts(starts, EDGE_LOCATIONS[edge], game), "Flat paths should match node paths")
+                for start in starts[::41]:
+                    self.assertEqual(node_finder.navigate_multiple_endpoints(start, EDGE_LOCATIONS[edge], game),
+                        flat_finder.navigate_multiple_endpoints(start, EDGE_LOCATIONS[edge], game), "Flat path from {} should match".format(start))
+
+    def test_path_cache(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        other = self.make_turn_0_map(adv)
+        finder = ShortestPathFinder(flat_arrays=True, cache_size=2)
+        end_points = EDGE_LOCATIONS[game.game_map.TOP_RIGHT]
+        path = finder.navigate_multiple_endpoints([13, 0], end_points, game)
+        self.assertEqual((0, 1), (finder.cache_hits, finder.cache_misses), "The first search should miss")
+        self.assertEqual(path, finder.navigate_multiple_endpoints([13, 0], end_points, other), "Maps with the same walls should share a field")
+        self.assertEqual((1, 1), (finder.cache_hits, finder.cache_misses), "The second search should hit")
+
+        game.game_map.add_unit("FF", [14, 1], 0)
+        blocked_path = finder.navigate_multiple_endpoints([13, 0], end_points, game)
+        self.assertEqual(ShortestPathFinder().navigate_multiple_endpoints([13, 0], end_points, game), blocked_path, "New walls should not reuse an old field")
+        self.assertEqual((1, 2), (finder.cache_hits, finder.cache_misses), "New walls should miss")
+        game.game_map.remove_unit([14, 1])
+        self.assertEqual(game.game_map.stationary_hash, other.game_map.stationary_hash, "Removing the wall should restore the hash")
+        self.assertEqual(path, finder.navigate_multiple_endpoints([13, 0], end_points, game), "The original field should still be cached")
+        self.assertEqual((2, 2), (finder.cache_hits, finder.cache_misses), "The original walls should hit")
+
+        finder.navigate_multiple_endpoints([14, 0], EDGE_LOCATIONS[game.game_map.TOP_LEFT], game)
+        finder.navigate_multiple_endpoints([13, 0], end_points, other)
+        self.assertEqual((3, 3), (finder.cache_hits, finder.cache_misses), "The most recently used field should survive eviction")
+        game.game_map.add_unit("FF", [14, 1], 0)
+        finder.navigate_multiple_endpoints([13, 0], end_points, game)
+        self.assertEqual((3, 4), (finder.cache_hits, finder.cache_misses), "The least recently used field should have been evicted")
+        finder.clear_cache()
+        self.assertEqual((0, 0), (finder.cache_hits, finder.cache_misses), "Clearing the cache should reset the counters")
+
+    def test_shared_field_cache(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        clone = game.clone()
+        self.assertIsNot(game._shortest_path_finder, clone._shortest_path_finder, "Every game state should search with its own path finder")
+        self.assertIs(game._shortest_path_finder.field_cache, clone._shortest_path_finder.field_cache)
+        clone.attempt_spawn("FF", [[12, 2], [13, 2], [14, 2], [15, 2]])
+        starts = [list(location) for location in EDGE_LOCATIONS[2] + EDGE_LOCATIONS[3] if not clone.contains_stationary_unit(location)]
+        expected = [game.find_paths_to_edge(starts), clone.find_paths_to_edge(starts)]
+        results = [[], []]
+        def search(state, result):
+            for _ in range(20):
+                state.game_map.add_unit("FF", [13, 8], 0)
+                state.game_map.remove_unit([13, 8])
+                result.append(state.find_paths_to_edge(starts))
+        threads = [threading.Thread(target=search, args=(state, result)) for state, result in zip([game, clone], results)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for paths, result in zip(expected, results):
+            self.assertEqual([paths] * 20, result, "Searches on two threads should not disturb each other")
+
+    def edge_field(self, game, end_points):
+        finder = ShortestPathFinder()
+        finder._initialize_search(game, end_points)
+        finder._validate(end_points[0], end_points)
+        return [[(node.blocked, node.pathlength) for node in column] for column in finder.game_map]
+
+    def test_incremental_pathing(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        end_points = EDGE_LOCATIONS[game.game_map.TOP_RIGHT]
+        ring = [[4, 9], [5, 9], [6, 9], [3, 10], [7, 10], [3, 11], [7, 11], [4, 12], [5, 12]]
+        for location in ring:
+            game.game_map.add_unit("FF", location, 0)
+        finder = IncrementalPathFinder()
+        warnings = []
+        write = navigation.debug_write
+        try:
+            navigation.debug_write = warnings.append
+            self.assertFalse(finder.block([6, 12]), "Nothing can be blocked before the field is built")
+        finally:
+            navigation.debug_write = write
+        self.assertEqual(1, len(warnings))
+        finder.build_field(game, end_points)
+        self.assertEqual(self.edge_field(game, end_points), [[(node.blocked, node.pathlength) for node in column] for column in finder.game_map])
+
+        for location in [[0, 0], [27, 27], [-1, 13], [13, 28], [30, 2]]:
+            self.assertFalse(finder.block(location), "{} is not on the board".format(location))
+            self.assertFalse(finder.unblock(location), "{} is not on the board".format(location))
+        self.assertFalse(finder.undo(), "Locations off the board should not be recorded")
+        self.assertEqual(self.edge_field(game, end_points), [[(node.blocked, node.pathlength) for node in column] for column in finder.game_map])
+
+        #Closing the ring turns its inside into a pocket
+        self.assertTrue(finder.block([6, 12]), "The gap in the ring should be open")
+        game.game_map.add_unit("FF", [6, 12], 0)
+        self.assertEqual(-1, finder.game_map[5][10].pathlength, "Tiles inside a closed ring cannot reach the edge")
+        self.assertEqual(game.find_path_to_edge([5, 10]), finder.get_path([5, 10]), "Pocket paths should match a full search")
+        self.assertEqual(self.edge_field(game, end_points), [[(node.blocked, node.pathlength) for node in column] for column in finder.game_map])
+        self.assertTrue(finder.undo(), "Undo should reopen the gap")
+        game.game_map.remove_unit([6, 12])
+        self.assertEqual(game.find_path_to_edge([5, 10]), finder.get_path([5, 10]), "Reopened pocket paths should match a full search")
+
+    def test_incremental_pathing_random(self, adv=False):
+        rng = random.Random(8)
+        game = self.make_turn_0_map(adv)
+        end_points = EDGE_LOCATIONS[game.game_map.TOP_LEFT]
+        finder = IncrementalPathFinder()
+        finder.build_field(game, end_points)
+        for step in range(150):
+            location = list(CELL_LOCATIONS[rng.randrange(len(CELL_LOCATIONS))])
+            if step % 7 == 6:
+                x, y, blocked = finder._changes[-1]
+                finder.undo()
+                if blocked:
+                    game.game_map.remove_unit([x, y])
+                else:
+                    game.game_map.add_unit("FF", [x, y], 0)
+            elif game.contains_stationary_unit(location):
+                finder.unblock(location)
+                game.game_map.remove_unit(location)
+            else:
+                finder.block(location)
+                game.game_map.add_unit("FF", location, 0)
+            if step % 15 == 0:
+                self.assertEqual(self.edge_field(game, end_points), [[(node.blocked, node.pathlength) for node in column] for column in finder.game_map],
+                    "Repaired field differs from a full rebuild after step {}".format(step))
+                for start in CELL_LOCATIONS[::53]:
+                    self.assertEqual(game.find_path_to_edge(list(start), game.game_map.TOP_LEFT), finder.get_path(list(start)), "Incremental path from {} differs".format(start))
+
+    def test_unit_indexes(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        game_map.add_unit("PI", [13, 0], 0)
+        game_map.add_unit("PI", [13, 0], 0)
+        game_map.add_unit("SI", [13, 0], 1)
+        game_map.add_unit("EI", [14, 27], 1)
+        game_map.add_unit("DF", [13, 5], 0)
+        self.assertEqual(2, len(game_map.mobile_units[0][13 * 28]), "Both pings should be indexed")
+        self.assertEqual([13 * 28, 14 * 28 + 27], sorted(game_map.mobile_units[1]), "Enemy units should be indexed by cell")
+        self.assertIs(game_map[13, 5][0], game_map.get_stationary_unit([13, 5]), "The destructor should be indexed")
+        self.assertIs(game_map[13, 5][0], game.contains_stationary_unit([13, 5]))
+        self.assertEqual(None, game_map.get_stationary_unit([13, 6]))
+
+        near = game_map.get_mobile_units_in_range([13, 3], 3, 0)
+        self.assertEqual([list(game_map[13, 0][:2])], near, "Only our pings should be found")
+        self.assertEqual([], game_map.get_mobile_units_in_range([14, 20], 3, 1), "Nothing should be in range")
+        game_map.remove_unit([13, 0])
+        self.assertEqual({}, game_map.mobile_units[0], "Removing should clear the index")
+        self.assertEqual([14 * 28 + 27], list(game_map.mobile_units[1]))
+        game_map[13, 5] = []
+        self.assertEqual(None, game_map.get_stationary_unit([13, 5]), "Assigning should update the index")
+        game_map[14, 27] = game_map[14, 27] + game_map[14, 27]
+        self.assertEqual(2, len(game_map.mobile_units[1][14 * 28 + 27]), "Assigning should update the index")
+        with self.assertRaises(AttributeError, msg="The units at a location should not be changed in place"):
+            game_map[14, 27].append(game_map[14, 27][0])
+        game_map[13, 5] += (GameUnit("FF", game.config, 0, None, 13, 5),)
+        self.assertEqual(1, game_map.stationary_owner[13 * 28 + 5], "Adding to a location should update the index")
+
+        rng = random.Random(19)
+        for _ in range(60):
+            location = list(CELL_LOCATIONS[rng.randrange(len(CELL_LOCATIONS))])
+            game_map.add_unit(rng.choice(["PI", "EI", "SI"]), location, rng.randrange(2))
+        for _ in range(20):
+            center = list(CELL_LOCATIONS[rng.randrange(len(CELL_LOCATIONS))])
+            for radius in [1.5, 3, 5]:
+                expected = [[unit for unit in game_map[location] if unit.player_index == 1] for location in game_map.get_range_locations(center, radius)]
+                self.assertEqual([units for units in expected if units], game_map.get_mobile_units_in_range(center, radius, 1),
+                    "Units in range of {} differ".format(center))
+
+    def test_clone(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.attempt_spawn("FF", [13, 5])
+        game.attempt_spawn("PI", [13, 0])
+        clone = game.clone()
+        self.assertIs(type(game), type(clone))
+        self.assertEqual(2, clone.attempt_spawn("DF", [[12, 5], [14, 5]]))
+        self.assertEqual(2, clone.attempt_spawn("PI", [13, 0], 2))
+        self.assertEqual(1, len(game.game_map[13, 0]), "Spawning on the clone should not change the original map")
+        self.assertEqual(1, len(game.game_map.mobile_units[0][13 * 28]), "Spawning on the clone should not change the original index")
+        self.assertEqual((), game.game_map[12, 5])
+        self.assertEqual((24, 4), (game.get_resource(game.CORES), game.get_resource(game.BITS)), "The original should keep its resources")
+        self.assertEqual((18, 2), (clone.get_resource(clone.CORES), clone.get_resource(clone.BITS)))
+        self.assertEqual([("FF", 13, 5)], game._build_stack)
+        self.assertEqual(3, len(clone._build_stack))
+        game.attempt_spawn("PI", [13, 0])
+        self.assertEqual(3, len(clone.game_map[13, 0]), "Spawning on the original should not change the clone")
+
+        self.assertEqual(1, clone.attempt_remove([13, 5]))
+        self.assertTrue(clone.undo())
+        self.assertEqual([("FF", 13, 5), ("DF", 12, 5), ("DF", 14, 5)], clone._build_stack, "Undo should drop the removal")
+        self.assertTrue(clone.undo())
+        self.assertTrue(clone.undo())
+        self.assertEqual(1, len(clone.game_map[13, 0]), "Undo should take the spawned units off the map")
+        self.assertEqual(1, len(clone.game_map.mobile_units[0][13 * 28]))
+        self.assertFalse(clone.contains_stationary_unit([12, 5]))
+        self.assertEqual(game.game_map.stationary_hash, clone.game_map.stationary_hash, "Both states should have the same walls again")
+        self.assertEqual((24, 4), (clone.get_resource(clone.CORES), clone.get_resource(clone.BITS)), "Undo should refund the spawns")
+        self.assertEqual([("FF", 13, 5)], clone._build_stack)
+        self.assertEqual([("PI", 13, 0)], clone._deploy_stack)
+        self.assertFalse(clone.undo(), "Calls made before the clone should not be undone")
+        self.assertEqual(2, len(game.game_map[13, 0]), "Undo on the clone should not change the original")
+        self.assertFalse(game.undo(), "States that were not cloned should not record their calls")
+
+        clone.attempt_spawn("DF", [12, 5])
+        nested = clone.clone()
+        nested.attempt_spawn("DF", [14, 5])
+        self.assertTrue(nested.undo())
+        self.assertTrue(nested.undo(), "A clone of a clone should reach back to the first clone")
+        self.assertFalse(nested.undo())
+        self.assertFalse(nested.contains_stationary_unit([12, 5]))
+
+        write, send = game_state.debug_write, game_state.send_command
+        try:
+            game_state.debug_write = lambda *args: None
+            game_state.send_command = lambda command: None
+            clone.submit_turn()
+        finally:
+            game_state.debug_write, game_state.send_command = write, send
+        self.assertFalse(clone.undo(), "Submitting the turn should clear the undo log")
+
+    def test_spawn_many(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        self.assertEqual([2, 1, 0, 0], game.attempt_spawn_many([("PI", [13, 0], 2), ("FF", [[13, 5], [13, 5]], 1), ("XX", [13, 6], 1), ("DF", [13, 6], 0)]))
+        self.assertEqual([("FF", 13, 5)], game._build_stack)
+        self.assertEqual([("PI", 13, 0), ("PI", 13, 0)], game._deploy_stack)
+        self.assertEqual((24, 3), (game.get_resource(game.CORES), game.get_resource(game.BITS)))
+        clone = self.make_turn_0_map(adv).clone()
+        clone.attempt_spawn_many([("PI", [13, 0], 2), ("FF", [[13, 5], [13, 5]], 1)])
+        self.assertTrue(clone.undo())
+        self.assertFalse(clone.undo(), "The whole call should be reverted by one undo")
+        self.assertEqual((25, 5), (clone.get_resource(clone.CORES), clone.get_resource(clone.BITS)))
+
+        rng = random.Random(24)
+        locations = [list(location) for location in CELL_LOCATIONS] + [[0, 0], [27, 27]]
+        for _ in range(10):
+            spawns = []
+            for _ in range(40):
+                unit_type = rng.choice(["FF", "EF", "DF", "PI", "EI", "SI"])
+                if unit_type in ["PI", "EI", "SI"] and rng.random() < 0.8:
+                    location = list(rng.choice(EDGE_LOCATIONS[rng.choice([2, 3])]))
+                else:
+                    location = rng.choice(locations)
+                spawns.append((unit_type, location if rng.random() < 0.5 else [location, location], rng.randint(1, 3)))
+            expected = self.make_turn_0_map(adv)
+            expected.suppress_warnings(False)
+            actual = expected.clone()
+            counts = [expected.attempt_spawn(*spawn) for spawn in spawns]
+            self.assertEqual(counts, actual.attempt_spawn_many(spawns))
+            self.assertLess(0, len(actual.rejections))
+            self.assertEqual(list(expected.rejections), list(actual.rejections), "The same spawns should be rejected for the same reasons")
+            self.assertEqual(expected._build_stack, actual._build_stack)
+            self.assertEqual(expected._deploy_stack, actual._deploy_stack)
+            self.assertEqual(expected._player_resources, actual._player_resources)
+            self.assertEqual(expected.game_map.stationary_hash, actual.game_map.stationary_hash)
+            for location in CELL_LOCATIONS:
+                self.assertEqual([unit.unit_type for unit in expected.game_map[location]], [unit.unit_type for unit in actual.game_map[location]])
+            self.assertTrue(actual.undo())
+            self.assertEqual([], actual._build_stack + actual._deploy_stack)
+            self.assertEqual(0, actual.game_map.stationary_hash)
+
+    def test_rejections(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.attempt_spawn("FF", [13, 5])
+        game.attempt_spawn("FF", [13, 5])
+        self.assertEqual(0, len(game.rejections), "Nothing should be recorded while warnings are suppressed")
+        game.suppress_warnings(False)
+        self.assertFalse(game.can_spawn("FF", [13, 5]))
+        self.assertFalse(game.can_spawn("PI", [13, 20]))
+        self.assertFalse(game.can_spawn("DF", [0, 0]))
+        removed = [13, 6]
+        self.assertEqual(0, game.attempt_remove(removed))
+        removed[0] = 14
+        self.assertFalse(game.can_spawn("DF", (13.0, 5.0)))
+        self.assertEqual([(game_state.LOCATION_BLOCKED, "FF", [13, 5]),
+                          (game_state.ENEMY_TERRITORY | game_state.NOT_ON_EDGE, "PI", [13, 20]),
+                          (game_state.LOCATION_INVALID, "DF", [0, 0]),
+                          (game_state.NOTHING_TO_REMOVE, "RM", [13, 6]),
+                          (game_state.LOCATION_BLOCKED, "DF", (13.0, 5.0))], list(game.rejections))
+        self.assertEqual(["Could not spawn FF at location [13, 5]. Location is blocked.",
+                          "Could not spawn PI at location [13, 20]. Location in enemy territory. Information units must be deployed on the edge.",
+                          "Could not spawn DF at location [0, 0]. Location invalid.",
+                          "Could not remove a unit from [13, 6]. Location has no firewall or is enemy territory.",
+                          "Could not spawn DF at location (13.0, 5.0). Location is blocked."], game.format_rejections(),
+                          "Locations should be written as they were given")
+
+        warnings = []
+        commands = []
+        write, send = game_state.debug_write, game_state.send_command
+        try:
+            game_state.debug_write = warnings.append
+            game_state.send_command = commands.append
+            expected = "\n".join(game.format_rejections())
+            game.submit_turn()
+            self.assertEqual([expected], warnings, "Every rejection should be written out at once")
+            self.assertEqual(0, len(game.rejections), "Submitting should clear the rejections")
+            self.assertEqual(2, len(commands))
+            game.submit_turn()
+            self.assertEqual(1, len(warnings), "Nothing should be written when nothing was rejected")
+
+            for i in range(game_state.REJECTION_BUFFER_SIZE + 3):
+                game.can_spawn("FF", [13, 5])
+            self.assertEqual(game_state.REJECTION_BUFFER_SIZE, len(game.rejections))
+            game.flush_rejections()
+            self.assertTrue(warnings[1].startswith("3 earlier rejected"), "Dropped rejections should be counted")
+
+            game.can_spawn("FF", [13, 5])
+            game.suppress_warnings(True)
+            game.flush_rejections()
+            self.assertEqual(2, len(warnings), "Rejections should not be written once warnings are suppressed")
+            self.assertEqual(0, len(game.rejections))
+        finally:
+            game_state.debug_write, game_state.send_command = write, send
+
+    def test_get_targets(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [13, 13], 0)
+        game.game_map.add_unit("FF", [13, 14], 1)
+        destructor = game.game_map[13, 13][0]
+        wall = game.game_map[13, 14][0]
+        self.assertIs(wall, game.get_target(destructor), "The only enemy in range should be the target")
+        game.game_map.add_unit("PI", [14, 16], 1)
+        ping = game.game_map[14, 16][0]
+        self.assertIs(ping, game.get_target(destructor), "Information units should be preferred over firewalls")
+        self.assertEqual([ping, None], game.get_targets([destructor, "DF"]), "Invalid attackers should get no target")
+
+        rng = random.Random(18)
+        for _ in range(8):
+            game = self.make_turn_0_map(adv)
+            for _ in range(80):
+                location = list(CELL_LOCATIONS[rng.randrange(len(CELL_LOCATIONS))])
+                player_index = rng.randrange(2)
+                unit_type = rng.choice(["FF", "EF", "DF", "PI", "EI", "SI"])
+                if game.contains_stationary_unit(location) or (unit_type in ["FF", "EF", "DF"] and game.game_map[location]):
+                    continue
+                for _ in range(1 if unit_type in ["FF", "EF", "DF"] else rng.randint(1, 3)):
+                    game.game_map.add_unit(unit_type, location, player_index)
+                    unit = game.game_map[location][-1]
+                    unit.stability = rng.choice([5.0, 15.0, unit.stability])
+            attackers = [unit for location in CELL_LOCATIONS for unit in game.game_map[location] if unit.unit_type in ["DF", "PI", "EI", "SI"]]
+            expected = [game.get_target(unit) for unit in attackers]
+            targets = game.get_targets(attackers)
+            self.assertEqual(len(expected), len(targets))
+            for attacker, target, expected_target in zip(attackers, targets, expected):
+                self.assertIs(expected_target, target, "The target of {} differs from get_target".format(attacker))
+
     def test_print_unit(self, adv=False):
         game = self.make_turn_0_map(adv)
 
@@ -0,0 +1,202 @@
+import json
+from array import array
+
+EVENT_TYPES = ("spawn", "move", "damage", "attack", "melee", "death", "breach", "selfDestruct", "shield")
+SPAWN, MOVE, DAMAGE, ATTACK, MELEE, DEATH, BREACH, SELF_DESTRUCT, SHIELD = range(len(EVENT_TYPES))
+
+
+class ActionTimeline:
+    """A compact record of every event in the action frames of one action phase.
+    Add each frame as it arrives, for example from on_action_frame, and call clear before the next action phase.
+
+    Each event is one row, stored column by column in arrays, and the rows of each event type are indexed as they are added,
+    so each frame is only read once and queries only visit rows of the event types they need.
+    Player indices are 0 for you and 1 for your opponent, like everywhere else in gamelib.
+
+    Attributes:
+        * frames (int): The number of frames that have been added
+        * frame (array): The frame number of each row
+        * event (array): The index into EVENT_TYPES of each row
+        * unit_id (array): The unit the event is about. The attacker for attacks and the encryptor for shields
+        * unit_type (array): The type index of that unit, as in config["unitInformation"]
+        * player (array): The player index owning that unit
+        * x (array): The x coordinate of that unit. Its new location for moves
+        * y (array): The y coordinate of that unit
+        * target_id (array): The unit that was attacked or shielded, or -1
+        * target_x (array): The x coordinate of the target, or of the previous location for moves, or -1
+        * target_y (array): The y coordinate of the target, or of the previous location for moves, or -1
+        * amount (array): The damage or shield amount. For deaths, 1 if the unit was removed by its owner
+        * hp (array): The stability of the unit at the end of the frame, 0 if it was destroyed, or nan if the frame had no units
+        * cause (array): For deaths, the row of the last attack on the unit, or -1
+
+    """
+    def __init__(self, config):
+        """Sets up an empty timeline
+
+        Args:
+            * config (JSON): Contains information about the game
+
+        """
+        self.config = config
+        self.__type_index = {}
+        for index, unit_info in enumerate(config["unitInformation"]):
+            self.__type_index[unit_info["shorthand"]] = index
+        self.clear()
+
+    def clear(self):
+        """Removes every row, ready for the next action phase
+        """
+        self.frames = 0
+        self.frame = array('l')
+        self.event = array('b')
+        self.unit_id = array('l')
+        self.unit_type = array('b')
+        self.player = array('b')
+        self.x = array('b')
+        self.y = array('b')
+        self.target_id = array('l')
+        self.target_x = array('b')
+        self.target_y = array('b')
+        self.amount = array('d')
+        self.hp = array('d')
+        self.cause = array('l')
+        self._rows_by_event = [array('l') for _ in EVENT_TYPES]
+        self.__last_attack = {}
+
+    def __len__(self):
+        return len(self.event)
+
+    def add_frame(self, frame):
+        """Adds every event of an action frame
+
+        Args:
+            * frame: An action frame as a json string, a StateString, or already decoded
+
+        """
+        if isinstance(frame, dict):
+            state = frame
+        elif hasattr(frame, "state"):
+            state = frame.state
+        else:
+            state = json.loads(frame)
+        turn_info = state.get("turnInfo")
+        frame_number = int(turn_info[2]) if turn_info else self.frames
+        self.frames += 1
+        hp_by_id = self.__unit_stabilities(state)
+        events = state.get("events", {})
+
+        for location, unit_type, unit_id, player in events.get("spawn", []):
+            self.__add_row(frame_number, SPAWN, unit_id, unit_type, player, location, hp_by_id)
+        for location, previous, _, unit_type, unit_id, player in events.get("move", []):
+            self.__add_row(frame_number, MOVE, unit_id, unit_type, player, location, hp_by_id, target_location=previous)
+        for location, damage, unit_type, unit_id, player in events.get("damage", []):
+            self.__add_row(frame_number, DAMAGE, unit_id, unit_type, player, location, hp_by_id, amount=damage)
+        for location, target, damage, unit_type, unit_id, target_id, player in events.get("attack", []):
+            self.__last_attack[int(target_id)] = len(self.event)
+            self.__add_row(frame_number, ATTACK, unit_id, unit_type, player, location, hp_by_id, target_id, target, damage)
+        for location, target, damage, unit_type, unit_id, player in events.get("melee", []):
+            self.__add_row(frame_number, MELEE, unit_id, unit_type, player, location, hp_by_id, target_location=target, amount=damage)
+        for location, unit_type, unit_id, player, removed_by_owner in events.get("death", []):
+            cause = self.__last_attack.get(int(unit_id), -1)
+            self.__add_row(frame_number, DEATH, unit_id, unit_type, player, location, hp_by_id, amount=1 if removed_by_owner else 0, cause=cause)
+        for location, damage, unit_type, unit_id, player in events.get("breach", []):
+            self.__add_row(frame_number, BREACH, unit_id, unit_type, player, location, hp_by_id, amount=damage)
+        for location, _, damage, unit_type, unit_id, player in events.get("selfDestruct", []):
+            self.__add_row(frame_number, SELF_DESTRUCT, unit_id, unit_type, player, location, hp_by_id, amount=damage)
+        for location, target, amount, unit_type, unit_id, target_id, player in events.get("shield", []):
+            self.__add_row(frame_number, SHIELD, unit_id, unit_type, player, location, hp_by_id, target_id, target, amount)
+
+    def __unit_stabilities(self, state):
+        """Maps unit id to stability for every unit in the frame, or returns None if the frame has no unit lists
+        """
+        if "p1Units" not in state or "p2Units" not in state:
+            return None
+        hp_by_id = {}
+        for units in (state["p1Units"], state["p2Units"]):
+            for unit_list in units:
+                for unit in unit_list:
+                    hp_by_id[unit[3]] = unit[2]
+        return hp_by_id
+
+    def __add_row(self, frame_number, event, unit_id, unit_type, player, location, hp_by_id, target_id=-1, target_location=None, amount=0, cause=-1):
+        self._rows_by_event[event].append(len(self.event))
+        self.frame.append(frame_number)
+        self.event.append(event)
+        self.unit_id.append(int(unit_id))
+        self.unit_type.append(unit_type)
+        self.player.append(player - 1)
+        self.x.append(location[0])
+        self.y.append(location[1])
+        self.target_id.append(int(target_id))
+        self.target_x.append(target_location[0] if target_location else -1)
+        self.target_y.append(target_location[1] if target_location else -1)
+        self.amount.append(amount)
+        self.hp.append(float("nan") if hp_by_id is None else float(hp_by_id.get(unit_id, 0)))
+        self.cause.append(cause)
+
+    def rows(self, event_type):
+        """The rows of a single event type, in the order they happened
+
+        Args:
+            * event_type: One of EVENT_TYPES, such as "breach"
+
+        Returns:
+            An array of row indices
+
+        """
+        return self._rows_by_event[EVENT_TYPES.index(event_type)]
+
+    def breach_locations(self, player_index=1):
+        """Where the given player's units scored, one entry per unit
+
+        Args:
+            * player_index: The player whose breaches to list, 0 for you 1 for the enemy
+
+        Returns:
+            A list of locations [x, y]
+
+        """
+        return [[self.x[row], self.y[row]] for row in self._rows_by_event[BREACH] if self.player[row] == player_index]
+
+    def damage_dealt(self, unit_type, player_index=0):
+        """The total damage dealt by each of the given player's units of a type, such as each destructor
+
+        Args:
+            * unit_type: The type of attacking unit
+            * player_index: The player owning the attackers, 0 for you 1 for the enemy
+
+        Returns:
+            A dict from the attacker's location [x, y] as a tuple to the damage it dealt
+
+        """
+        type_index = self.__type_index[unit_type]
+        damage = {}
+        for row in self._rows_by_event[ATTACK]:
+            if self.player[row] == player_index and self.unit_type[row] == type_index:
+                location = (self.x[row], self.y[row])
+                damage[location] = damage.get(location, 0) + self.amount[row]
+        return damage
+
+    def deaths(self, player_index=0):
+        """The given player's units that were destroyed, and what last attacked them
+
+        Args:
+            * player_index: The player whose units to list, 0 for you 1 for the enemy
+
+        Returns:
+            A list of ([x, y], unit_type, killer_location, killer_type) tuples. The killer is None if no attack on the unit was seen.
+            Units removed by their owner are not included
+
+        """
+        deaths = []
+        for row in self._rows_by_event[DEATH]:
+            if self.player[row] != player_index or self.amount[row]:
+                continue
+            unit_type = self.config["unitInformation"][self.unit_type[row]]["shorthand"]
+            cause = self.cause[row]
+            if cause == -1:
+                deaths.append(([self.x[row], self.y[row]], unit_type, None, None))
+            else:
+                killer_type = self.config["unitInformation"][self.unit_type[cause]]["shorthand"]
+                deaths.append(([self.x[row], self.y[row]], unit_type, [self.x[cause], self.y[cause]], killer_type))
+        return deaths
@@ -1,6 +1,54 @@
 def is_stationary(unit_type, firewall_types):
     return unit_type in firewall_types
 
+# Indices into config["unitInformation"]. The encryptor is the only firewall whose damage is its shield amount
+FIREWALL_INDICES = (0, 1, 2)
+ENCRYPTOR_INDEX = 1
+DESTRUCTOR_INDEX = 2
+SCRAMBLER_INDEX = 5
+REMOVE_INDEX = 6
+
+_prototype_config = None
+_prototypes = None
+
+def unit_prototypes(config):
+    """Builds the attributes shared by every unit of each type, once per config
+
+    Args:
+        * config (JSON): Contains information about the game
+
+    Returns:
+        A list indexed like config["unitInformation"] of attribute dicts, with None for the remove type
+
+    """
+    global _prototype_config, _prototypes
+    if config is _prototype_config:
+        return _prototypes
+    prototypes = []
+    for index, type_config in enumerate(config["unitInformation"]):
+        if index == REMOVE_INDEX:
+            prototypes.append(None)
+            continue
+        prototype = {"unit_type": type_config["shorthand"]}
+        prototype["stationary"] = index in FIREWALL_INDICES
+        if prototype["stationary"]:
+            prototype["speed"] = 0
+            if index == ENCRYPTOR_INDEX:
+                prototype["damage"] = type_config["shieldAmount"]
+            else:
+                prototype["damage"] = type_config["damage"]
+        else:
+            prototype["speed"] = type_config["speed"]
+            prototype["damage_f"] = type_config["damageF"]
+            prototype["damage_i"] = type_config["damageI"]
+        prototype["range"] = type_config["range"]
+        prototype["max_stability"] = type_config["stability"]
+        prototype["cost"] = type_config["cost"]
+        prototypes.append(prototype)
+    _prototype_config = config
+    _prototypes = prototypes
+    return prototypes
+
 class GameUnit:
     """Holds information about a Unit. 
 
@@ -34,6 +82,20 @@ class GameUnit:
         self.__serialize_type()
         self.stability = self.max_stability if not stability else stability
 
+    @classmethod
+    def _from_prototype(cls, prototype, config, player_index, stability, x, y):
+        """Builds a unit from an entry of unit_prototypes without looking anything up in the config. Used when parsing the game state.
+        """
+        unit = cls.__new__(cls)
+        unit.__dict__.update(prototype)
+        unit.config = config
+        unit.player_index = player_index
+        unit.pending_removal = False
+        unit.x = x
+        unit.y = y
+        unit.stability = prototype["max_stability"] if not stability else stability
+        return unit
+
     def __serialize_type(self):
         from .game_state import FIREWALL_TYPES, UNIT_TYPE_TO_INDEX, ENCRYPTOR
         self.stationary = is_stationary(self.unit_type, FIREWALL_TYPES)
@@ -1,7 +1,132 @@
 import sys
+import json
+import re
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
+_json_decoder = json.JSONDecoder()
+_colon = re.compile(r"[ \t\n\r]*:[ \t\n\r]*")
+
+
+class StateString(str):
+    """A game state string received from the game that decodes its json at most once.
+    It can be used anywhere the raw string was used before, and the decoded json is available as state.
+
+    Attributes:
+        * state (dict): The decoded json, decoded the first time it is accessed
+        * fields (list): If set before state is first accessed, only these fields are decoded. See decode_state_fields
+        * decoded_values (dict): The top level values decode_state_fields has decoded from this string so far, by key
+
+    """
+    fields = None
+
+    @property
+    def decoded_values(self):
+        return self.__dict__.setdefault("_decoded_values", {})
+
+    @property
+    def state(self):
+        if "_state" not in self.__dict__:
+            if self.fields is None:
+                self._state = json.loads(self)
+            else:
+                self._state = decode_state_fields(self, self.fields)
+        return self._state
+
+
+def decode_state_fields(state_string, fields):
+    """Decodes only some fields of a game state string.
+    Each top level value that is needed is found by its key and decoded on its own, so the rest of the string is never decoded.
+    Keys with the same name nested deeper in the state are skipped, and if a key only appears nested the whole string is decoded instead.
+    For a StateString each top level value is decoded only once, however many times its fields are asked for.
+
+    Args:
+        * state_string: A game state string received from the game
+        * fields: A list of field paths, such as "p2Units" or "events.breach"
+
+    Returns:
+        A dict nested like the full state holding only the requested fields. Fields that are not in the state are left out.
+
+    """
+    values = state_string.decoded_values if isinstance(state_string, StateString) else {}
+    state = {}
+    # Shorter paths go last so that asking for "events" and "events.breach" keeps all of events
+    for field in sorted(fields, key=lambda path: -path.count(".")):
+        keys = field.split(".")
+        if keys[0] not in values:
+            values[keys[0]] = _decode_top_level_value(state_string, keys[0])
+        value = values[keys[0]]
+        for key in keys[1:]:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None:
+            continue
+        target = state
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+        target[keys[-1]] = value
+    return state
+
+
+def _find_top_level_value(state_string, key):
+    """Finds where the value stored under a top level key starts, allowing whitespace around the colon.
+    A match counts as top level when exactly one bracket is open before it, the one around the whole state.
+    Game states hold no brackets inside strings, so counting them is enough.
+
+    Returns:
+        The index the value starts at, -1 if the key is not in the string at all, or None if it only appears nested
+        in other values, in which case the whole string has to be decoded to be sure
+
+    """
+    quoted_key = '"{}"'.format(key)
+    found = False
+    start = state_string.find(quoted_key)
+    while start != -1:
+        colon = _colon.match(state_string, start + len(quoted_key))
+        if colon is not None:
+            found = True
+            depth = (state_string.count("{", 0, start) + state_string.count("[", 0, start) -
+                     state_string.count("}", 0, start) - state_string.count("]", 0, start))
+            if depth == 1:
+                return colon.end()
+        start = state_string.find(quoted_key, start + 1)
+    return None if found else -1
+
+
+def _decode_top_level_value(state_string, key):
+    """Decodes the value stored under a top level key, or returns None if the key is missing
+    """
+    index = _find_top_level_value(state_string, key)
+    if index == -1:
+        return None
+    if index is not None:
+        try:
+            return _json_decoder.raw_decode(state_string, index)[0]
+        except ValueError:
+            pass
+    return json.loads(state_string).get(key)
+
+
+def get_state_type(state_string):
+    """Reads the first entry of turnInfo without decoding the rest of the string
+
+    Args:
+        * state_string: A game state string received from the game
+
+    Returns:
+        The state type (0 for a turn, 1 for an action frame, 2 for the end of the game), or None if it could not be read
+
+    """
+    index = _find_top_level_value(state_string, "turnInfo")
+    if index is None or index == -1:
+        return None
+    end = state_string.find(",", index)
+    first_entry = state_string[index:end].strip()
+    if end == -1 or not first_entry.startswith("["):
+        return None
+    try:
+        return int(first_entry[1:])
+    except ValueError:
+        return None
 
 
 def get_command():